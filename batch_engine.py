@@ -0,0 +1,261 @@
+"""
+A vectorized version of the two player engine in blazing8s.py.
+Instead of simulating one game at a time with Card objects this advances
+thousands of independent games in lockstep using NumPy arrays.
+
+Each hand is stored as a 13x5 grid of card counts, the same layout that
+AgentPlayer.get_hand_state builds: row `number - 1`, column `suite.value`
+(column 0 is used for swaps and 8s which have no color in the hand).
+The top card is stored as two integer arrays, one for the number and one for
+the color.
+
+The rules are the same as Game.apply_card_effect:
+  - Swap (1): swaps the hands if both players still have cards, the top card stays.
+  - 8: keeps the number of the top card and changes the color.
+  - J (11): the player who played it goes again.
+  - K (13): the other player draws one card.
+  - A game that goes over 1000 turns is a draw.
+"""
+
+import numpy as np
+
+MAX_TURNS = 1000
+HAND_START_SIZE = 5
+
+# Mirrors blazing8s.possible_cards and blazing8s.possible_suite.
+possible_cards = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 13])
+possible_suite = np.array([1, 2, 3, 4])
+
+# PLAYABLE[top_number, top_suite] is a 13x5 mask of the cells that can be played on that top card.
+PLAYABLE = np.zeros((14, 5, 13, 5), dtype=bool)
+for _top_number in range(1, 14):
+    for _top_suite in range(5):
+        for _number in range(1, 14):
+            for _suite in range(5):
+                PLAYABLE[_top_number, _top_suite, _number - 1, _suite] = (
+                    _suite == _top_suite
+                    or _number == _top_number
+                    or _number == 8
+                    or _number == 1
+                )
+
+NO_PLAY = -1
+
+
+def random_cells(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Draws n random cards and returns their flat cell index (row * 5 + column)."""
+    numbers = possible_cards[rng.integers(0, len(possible_cards), size=n)]
+    suites = possible_suite[rng.integers(0, len(possible_suite), size=n)]
+    suites = np.where((numbers == 1) | (numbers == 8), 0, suites)
+    return (numbers - 1) * 5 + suites
+
+
+def pick_weighted(rng: np.random.Generator, weights: np.ndarray, extra=0) -> np.ndarray:
+    """
+    Picks a random flat cell index from each row of weights (n, 65), proportional to the weight.
+    `extra` adds that many "no play" options to each row, which are returned as NO_PLAY.
+    Rows with no weight and no extra options return NO_PLAY.
+    """
+    cumulative = np.cumsum(weights, axis=1, dtype=np.int64)
+    total = cumulative[:, -1] + extra
+    r = np.floor(rng.random(len(weights)) * total)
+    picks = (cumulative > r[:, None]).argmax(axis=1)
+    picks[cumulative[:, -1] <= r] = NO_PLAY
+    picks[total == 0] = NO_PLAY
+    return picks
+
+
+class BatchRandomPolicy:
+    """Batch equivalent of blazing8s.RandomPlayer."""
+
+    def __init__(self, GOOD_RANDOM: bool = True):
+        self.GOOD_RANDOM = GOOD_RANDOM
+
+    def __call__(self, rng, hands, top_number, top_suite, enemy_hand_length, drew):
+        playable = hands * PLAYABLE[top_number, top_suite]
+        cells = pick_weighted(
+            rng, playable.reshape(len(hands), -1), 0 if self.GOOD_RANDOM else 1
+        )
+        colors = possible_suite[rng.integers(0, len(possible_suite), size=len(hands))]
+        return cells, colors
+
+
+class BatchSimpleStrategyPolicy:
+    """
+    Batch equivalent of blazing8s.SimpleStrategyPlayer.
+    Cards are picked in this order:
+      1. A K of the same suite.
+      2. A K of another suite.
+      3. A normal card of the same suite.
+      4. A normal card of another suite.
+      5. An 8, changing to the suite with the most playable cards. Like SimpleStrategyPlayer this counts
+         the swaps and 8s in column 0, so the 8 often changes to no color (suite 0).
+      6. A random playable card.
+    When several cards fit a step one of them is picked at random, since the
+    count grid has no notion of the order of the cards in the hand.
+    """
+
+    # TIERS[top_suite] holds one 13x5 mask per step above.
+    TIERS = np.zeros((5, 6, 13, 5), dtype=np.float32)
+    for _top_suite in range(5):
+        _same = np.zeros((13, 5), dtype=bool)
+        _same[:, _top_suite] = True
+        _normal = np.ones((13, 5), dtype=bool)
+        _normal[[0, 7, 10], :] = False
+        _king = np.zeros((13, 5), dtype=bool)
+        _king[12, :] = True
+        _eight = np.zeros((13, 5), dtype=bool)
+        _eight[7, :] = True
+        TIERS[_top_suite] = [
+            _king & _same,
+            _king & ~_same,
+            _normal & _same,
+            _normal & ~_same,
+            _eight,
+            np.ones((13, 5), dtype=bool),
+        ]
+    TIERS = TIERS.reshape(5, 6, 65)
+
+    def __call__(self, rng, hands, top_number, top_suite, enemy_hand_length, drew):
+        n = len(hands)
+        playable = (hands * PLAYABLE[top_number, top_suite]).reshape(n, 65)
+        weights = np.zeros((n, 65), dtype=np.float32)
+        for suite in range(5):
+            group = top_suite == suite
+            if not group.any():
+                continue
+            tiers = self.TIERS[suite]
+            tier = (playable[group] @ tiers.T > 0).argmax(axis=1)
+            weights[group] = playable[group] * tiers[tier]
+        cells = pick_weighted(rng, weights)
+
+        # Column 0 is counted too, and argmax picks the first of equal counts like list.index(max(...)).
+        suite_counts = playable.reshape(n, 13, 5).sum(axis=1)
+        colors = suite_counts.argmax(axis=1)
+        return cells, colors
+
+
+class BatchGame:
+    """
+    Plays `n_games` independent games between two batch policies.
+    Player 1 is seat 0 and player 2 is seat 1.
+    """
+
+    def __init__(self, policy1, policy2, n_games: int, seed: int | None = None):
+        self.policies = (policy1, policy2)
+        self.n_games = n_games
+        self.rng = np.random.default_rng(seed)
+        self.hands = np.zeros((n_games, 2, 13, 5), dtype=np.int16)
+        self.hand_sizes = np.zeros((n_games, 2), dtype=np.int16)
+        self.top_number = np.zeros(n_games, dtype=np.int64)
+        self.top_suite = np.zeros(n_games, dtype=np.int64)
+        self.current_player = self.rng.integers(0, 2, size=n_games)
+        self.turns = np.zeros(n_games, dtype=np.int64)
+        self.last_player_played = np.zeros(n_games, dtype=bool)
+        # 0 while the game is running or if it hit the turn cap, otherwise 1 or 2 like Game.start.
+        self.winners = np.zeros(n_games, dtype=np.int64)
+        self.active = np.ones(n_games, dtype=bool)
+
+    def draw(self, games: np.ndarray, seats: np.ndarray) -> None:
+        cells = random_cells(self.rng, len(games))
+        # A game never appears twice in one call so plain fancy indexing is safe.
+        self.hands[games, seats, cells // 5, cells % 5] += 1
+        self.hand_sizes[games, seats] += 1
+
+    def start(self) -> np.ndarray:
+        games = np.arange(self.n_games)
+        for _ in range(HAND_START_SIZE):
+            self.draw(games, np.zeros(self.n_games, dtype=np.int64))
+            self.draw(games, np.ones(self.n_games, dtype=np.int64))
+        cells = random_cells(self.rng, self.n_games)
+        while True:
+            redraw = np.isin(cells // 5 + 1, [1, 8])
+            if not redraw.any():
+                break
+            cells[redraw] = random_cells(self.rng, redraw.sum())
+        self.top_number = cells // 5 + 1
+        self.top_suite = cells % 5
+
+        while self.active.any():
+            self.turn()
+        return self.winners
+
+    def choose(self, games, seats, drew: bool):
+        enemy_hand_length = self.hand_sizes[games, 1 - seats]
+        cells = np.full(len(games), NO_PLAY)
+        colors = np.zeros(len(games), dtype=np.int64)
+        for seat, policy in enumerate(self.policies):
+            mask = seats == seat
+            if not mask.any():
+                continue
+            g = games[mask]
+            cells[mask], colors[mask] = policy(
+                self.rng,
+                self.hands[g, seat],
+                self.top_number[g],
+                self.top_suite[g],
+                enemy_hand_length[mask],
+                drew,
+            )
+        return cells, colors
+
+    def turn(self) -> None:
+        games = np.flatnonzero(self.active)
+        seats = self.current_player[games]
+
+        cells, colors = self.choose(games, seats, False)
+        drawing = cells == NO_PLAY
+        if drawing.any():
+            self.draw(games[drawing], seats[drawing])
+            cells[drawing], colors[drawing] = self.choose(
+                games[drawing], seats[drawing], True
+            )
+
+        played = cells != NO_PLAY
+        skip = np.zeros(len(games), dtype=bool)
+        if played.any():
+            skip[played] = self.play(
+                games[played], seats[played], cells[played], colors[played]
+            )
+
+        won = self.hand_sizes[games, seats] == 0
+        self.turns[games] += 1
+        capped = self.turns[games] > MAX_TURNS
+        self.winners[games[won & ~capped]] = seats[won & ~capped] + 1
+        self.active[games[won | capped]] = False
+
+        switch = ~skip
+        self.current_player[games[switch]] = 1 - seats[switch]
+
+    def play(self, games, seats, cells, colors) -> np.ndarray:
+        """Plays the cards and applies their effect. Returns which games skip the next player."""
+        numbers = cells // 5 + 1
+        suites = cells % 5
+        self.hands[games, seats, numbers - 1, suites] -= 1
+        self.hand_sizes[games, seats] -= 1
+        both_have_cards = (self.hand_sizes[games] != 0).all(axis=1)
+
+        self.last_player_played[games[numbers != 11]] = True
+
+        new_top_number = numbers.copy()
+        new_top_suite = suites.copy()
+
+        swap = (numbers == 1) & both_have_cards
+        if swap.any():
+            g = games[swap]
+            self.hands[g] = self.hands[g][:, ::-1]
+            self.hand_sizes[g] = self.hand_sizes[g][:, ::-1]
+            new_top_number[swap] = self.top_number[g]
+            new_top_suite[swap] = self.top_suite[g]
+
+        eight = numbers == 8
+        new_top_number[eight] = self.top_number[games[eight]]
+        new_top_suite[eight] = colors[eight]
+
+        king = numbers == 13
+        if king.any():
+            self.draw(games[king], 1 - seats[king])
+
+        self.top_number[games] = new_top_number
+        self.top_suite[games] = new_top_suite
+        return (numbers == 11) & both_have_cards
@@ -0,0 +1,66 @@
+"""
+Compares the games per second of the scalar engine (blazing8s.Game) with the
+batch engine (batch_engine.BatchGame) for the same policies.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch_engine
+"""
+
+import argparse
+from time import perf_counter
+
+from batch_engine import BatchGame, BatchRandomPolicy, BatchSimpleStrategyPolicy
+from blazing8s import Game, RandomPlayer, SimpleStrategyPlayer
+
+PAIRINGS = {
+    "random vs random": (
+        lambda: RandomPlayer("Player 1"),
+        lambda: RandomPlayer("Player 2"),
+        BatchRandomPolicy,
+        BatchRandomPolicy,
+    ),
+    "random vs simple": (
+        lambda: RandomPlayer("Player 1"),
+        lambda: SimpleStrategyPlayer("Player 2"),
+        BatchRandomPolicy,
+        BatchSimpleStrategyPolicy,
+    ),
+    "simple vs simple": (
+        lambda: SimpleStrategyPlayer("Player 1"),
+        lambda: SimpleStrategyPlayer("Player 2"),
+        BatchSimpleStrategyPolicy,
+        BatchSimpleStrategyPolicy,
+    ),
+}
+
+
+def run_scalar(player1, player2, games: int) -> tuple[float, float]:
+    p1_wins = 0
+    t1 = perf_counter()
+    for _ in range(games):
+        if Game(player1, player2).start() == 1:
+            p1_wins += 1
+    return games / (perf_counter() - t1), p1_wins / games
+
+
+def run_batch(policy1, policy2, games: int, seed: int) -> tuple[float, float]:
+    t1 = perf_counter()
+    winners = BatchGame(policy1, policy2, games, seed=seed).start()
+    return games / (perf_counter() - t1), (winners == 1).mean()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scalar-games", type=int, default=3000)
+    parser.add_argument("--batch-games", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'pairing':20} {'scalar g/s':>12} {'batch g/s':>12} {'speedup':>8} {'scalar p1%':>11} {'batch p1%':>10}")
+    for name, (player1, player2, policy1, policy2) in PAIRINGS.items():
+        scalar_rate, scalar_wins = run_scalar(player1(), player2(), args.scalar_games)
+        batch_rate, batch_wins = run_batch(policy1(), policy2(), args.batch_games, args.seed)
+        print(
+            f"{name:20} {scalar_rate:12.0f} {batch_rate:12.0f} {batch_rate / scalar_rate:8.1f}"
+            f" {scalar_wins * 100:11.1f} {batch_wins * 100:10.1f}"
+        )
@@ -0,0 +1,111 @@
+"""
+Measures greedy DoubleQTableAgent.choose_action decisions per second, compared with the old version that
+merged q_table2 into the dict of q_table1 for every decision, and checks that acting greedily
+leaves both q tables unchanged.
+
+Run from the repository root:
+    python -m benchmarks.bench_choose_action
+"""
+
+import argparse
+import copy
+import random
+from time import perf_counter
+
+import rules
+from blazing8s import (
+    BetterAgentPlayer,
+    DoubleQTableAgent,
+    Game,
+    SimpleStrategyPlayer,
+    top_cell,
+)
+
+
+def old_choose_action(agent: DoubleQTableAgent, state: tuple, possible_actions: list) -> tuple:
+    """DoubleQTableAgent.choose_action before it read the tables in place, with epsilon 0."""
+    sorting_indices, state = agent.canonical_key(state)
+    q_table = agent.q_table1.get(state, {})
+    for k, v in agent.q_table2.get(state, {}).items():
+        if k not in q_table:
+            q_table[k] = v
+        else:
+            q_table[k] += v
+    best_actions = []
+    best_action_value = None
+    for action in possible_actions:
+        optimized_action = agent.optimize_action(action, sorting_indices)
+        if optimized_action not in q_table:
+            av = 0
+        else:
+            av = q_table[optimized_action]
+        if best_action_value is None or av > best_action_value:
+            best_action_value = av
+            best_actions = [action]
+        elif av == best_action_value:
+            best_actions.append(action)
+    return random.choice(best_actions)
+
+
+def train_and_record(games: int, seed: int) -> tuple[DoubleQTableAgent, list]:
+    """
+    Trains a DoubleQTableAgent for games seeded games against SimpleStrategyPlayer, then returns it with the
+    (state, possible actions) of every decision it makes in games // 10 more, so most states are in the tables.
+    Also used by test_choose_action.py.
+    """
+    agent = DoubleQTableAgent(epsilon=0.04, alpha=0.35, gamma=1)
+    player1 = BetterAgentPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    for i in range(games):
+        Game(player1, player2, seed=seed + i).start()
+    decisions = []
+    choose_card = player1.choose_card
+
+    def recording_choose_card(top, enemy_hand_length, drew, last_player_played):
+        possible_actions = rules.playable_actions(player1.hand.cells, top_cell(top))
+        if possible_actions:
+            state = player1.get_state(top, enemy_hand_length, drew, last_player_played)
+            decisions.append((state, possible_actions))
+        return choose_card(top, enemy_hand_length, drew, last_player_played)
+
+    player1.choose_card = recording_choose_card
+    for i in range(games // 10):
+        Game(player1, player2, seed=seed + games + i).start()
+    return agent, decisions
+
+
+def decisions_per_second(choose, decisions: list) -> float:
+    t1 = perf_counter()
+    for state, possible_actions in decisions:
+        choose(state, possible_actions)
+    return len(decisions) / (perf_counter() - t1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    agent, decisions = train_and_record(args.games, args.seed)
+    agent.epsilon = 0
+
+    tables = copy.deepcopy((agent.q_table1, agent.q_table2))
+    for state, possible_actions in decisions:
+        agent.choose_action(state, possible_actions)
+    if (agent.q_table1, agent.q_table2) != tables:
+        raise Exception("choose_action changed the q tables")
+    print(f"{len(decisions)} greedy decisions left the q tables unchanged")
+
+    new = max(decisions_per_second(agent.choose_action, decisions) for _ in range(5))
+    old_agent = copy.deepcopy(agent)
+    old = max(
+        decisions_per_second(
+            lambda state, actions: old_choose_action(old_agent, state, actions), decisions
+        )
+        for _ in range(5)
+    )
+    changed = sum(old_agent.q_table1[k] != v for k, v in agent.q_table1.items())
+    print(f"old: {old:9.0f} decisions/s, changed {changed} states of q_table1")
+    print(f"new: {new:9.0f} decisions/s  {new / old:5.2f}x")
@@ -0,0 +1,89 @@
+"""
+Compares the speed of game.DiscordGame with deck_game.DeckGame, and checks that both
+play the same games for the same seeds when the players make the same choices.
+The speed is measured with game.RandomPlayer and its port in deck_game.py, which play the same games.
+
+Run from the repository root:
+    python -m benchmarks.bench_deck_game
+"""
+
+import argparse
+import random
+from time import perf_counter
+
+import deck_game
+from deck_game import DeckGame, DeckPlayer
+from game import Card, DiscordGame, Player, RandomPlayer, Suite, card_cell
+from q_table_file import pack_action
+
+
+class HighestCardPlayer(Player):
+    """Plays the playable card with the highest action code, an 8 as yellow. Draws once, then skips."""
+
+    def __init__(self, name: str, trace: list):
+        super().__init__(name)
+        self.trace = trace
+
+    def get_play(self, hand, playable_cards, top_card, cards_in_enemy_hand):
+        self.trace.append((card_cell(top_card), sorted(card_cell(c) for c in hand)))
+        cards = [c for c in playable_cards if isinstance(c, Card)]
+        if not cards:
+            return playable_cards[-1]
+        play = max(
+            cards,
+            key=lambda c: pack_action((8, 4)) if c.value == 8 else card_cell(c) + 5,
+        )
+        if play.value == 8:
+            play = Card(8, Suite.YELLOW)
+        return play
+
+
+class HighestDeckPlayer(DeckPlayer):
+    """HighestCardPlayer for DeckGame."""
+
+    def __init__(self, name: str, trace: list):
+        super().__init__(name)
+        self.trace = trace
+
+    def get_play(self, hand, actions, top_card, cards_in_enemy_hand, has_drawn):
+        self.trace.append((top_card, sorted(hand)))
+        return max(actions, key=pack_action)
+
+
+def check(games: int, seed: int) -> None:
+    for i in range(games):
+        discord_trace = []
+        deck_trace = []
+        discord_winner = DiscordGame(
+            HighestCardPlayer("Player 1", discord_trace),
+            HighestCardPlayer("Player 2", discord_trace),
+            seed + i,
+        ).loop()
+        deck_winner = DeckGame(
+            HighestDeckPlayer("Player 1", deck_trace),
+            HighestDeckPlayer("Player 2", deck_trace),
+            seed + i,
+        ).loop()
+        if discord_trace != deck_trace or discord_winner.name != deck_winner.name:
+            raise Exception(f"The games with seed {seed + i} are different")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    check(args.games // 10, args.seed)
+    print(f"{args.games // 10} games are the same in both engines")
+
+    for name, game, player in [
+        ("DiscordGame", DiscordGame, RandomPlayer),
+        ("DeckGame", DeckGame, deck_game.RandomPlayer),
+    ]:
+        random.seed(args.seed)
+        t1 = perf_counter()
+        for i in range(args.games):
+            game(player("Player 1"), player("Player 2"), args.seed + i).loop()
+        elapsed = perf_counter() - t1
+        print(f"{name:12} {args.games / elapsed:8.0f} games/s")
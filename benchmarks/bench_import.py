@@ -0,0 +1,62 @@
+"""
+Measures the cold start time of importing the engine modules in a fresh interpreter, compared with
+also importing pandas and matplotlib.pyplot as blazing8s.py did at module level before the training
+script moved to train.py, and checks that importing them loads neither.
+
+Run from the repository root:
+    python -m benchmarks.bench_import
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Modules that import blazing8s.
+MODULES = ["blazing8s", "agent", "parallel_training", "discord_simulation", "sweep"]
+HEAVY = ["pandas", "matplotlib"]
+
+
+def import_seconds(statement: str, runs: int) -> float:
+    """The median time statement takes in a fresh interpreter."""
+
+    def run(code: str) -> float:
+        timer = (
+            "import time; t = time.perf_counter(); "
+            f"{code}; print(time.perf_counter() - t)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", timer], capture_output=True, text=True, check=True
+        )
+        return float(output.stdout.split()[-1])
+
+    return statistics.median(run(statement) for _ in range(runs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for module in MODULES:
+        check = (
+            f"import sys, {module}; "
+            f"loaded = [m for m in {HEAVY} if m in sys.modules]; "
+            "print(','.join(loaded))"
+        )
+        loaded = subprocess.run(
+            [sys.executable, "-c", check], capture_output=True, text=True, check=True
+        ).stdout.split()
+        if loaded:
+            raise Exception(f"import {module} loads {loaded[0]}")
+    print(f"None of {', '.join(MODULES)} import {' or '.join(HEAVY)}")
+
+    for module in MODULES:
+        new = import_seconds(f"import {module}", args.runs)
+        old = import_seconds(
+            f"import {module}, pandas, matplotlib.pyplot", args.runs
+        )
+        print(
+            f"import {module:18} {new * 1000:7.1f} ms, with pandas and matplotlib "
+            f"{old * 1000:7.1f} ms  {old / new:5.2f}x"
+        )
@@ -0,0 +1,75 @@
+"""
+Memory per visited state of the dict q tables of DoubleQTableAgent and of the DenseQStore
+used by q_store.DenseDoubleQTableAgent, plus the time both agents take to train.
+
+Run from the repository root:
+    python -m benchmarks.bench_q_store
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+from time import perf_counter
+
+from blazing8s import BetterAgentPlayer, DoubleQTableAgent, Game, SimpleStrategyPlayer
+from q_store import DenseDoubleQTableAgent, DenseQStore
+from state_keys import unpack_state
+
+
+def measure(build) -> tuple[object, int]:
+    """Builds an object and returns it with the bytes allocated while building it."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def copy_table(q_table: dict, key=lambda k: k) -> dict:
+    # Fresh action tuples and floats, like the ones the agent creates while training.
+    return {
+        key(k): {tuple(a): float(v) for a, v in actions.items()}
+        for k, actions in q_table.items()
+    }
+
+
+def train(agent, games: int, seed: int) -> float:
+    random.seed(seed)
+    player1 = BetterAgentPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    t1 = perf_counter()
+    for _ in range(games):
+        Game(player1, player2).start()
+    return perf_counter() - t1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dict_agent = DoubleQTableAgent(epsilon=0.04, alpha=0.35, gamma=1)
+    dense_agent = DenseDoubleQTableAgent(epsilon=0.04, alpha=0.35, gamma=1)
+    dict_time = train(dict_agent, args.games, args.seed)
+    dense_time = train(dense_agent, args.games, args.seed)
+    print(f"training {args.games} games: dict {dict_time:.1f} s, dense {dense_time:.1f} s")
+
+    tables = (dict_agent.q_table1, dict_agent.q_table2)
+    states = len(set(tables[0]) | set(tables[1]))
+    _, tuple_size = measure(lambda: [copy_table(t, unpack_state) for t in tables])
+    _, packed_size = measure(
+        lambda: [copy_table(t, lambda k: bytes(bytearray(k))) for t in tables]
+    )
+    store, _ = measure(lambda: DenseQStore.from_dicts(*tables))
+    # Only count the rows in use, the arrays are allocated with room to grow.
+    dense_size = store.memory(len(store))
+    print(f"{states} states")
+    for name, size in [
+        ("dict, tuple keys", tuple_size),
+        ("dict, packed keys", packed_size),
+        ("dense", dense_size),
+    ]:
+        print(f"{name:18} {size / states:7.0f} bytes per state")
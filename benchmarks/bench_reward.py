@@ -0,0 +1,114 @@
+"""
+Checks that the rewards from the reward features kept by AgentPlayer, from reward_features and
+from a batch of feature vectors are the same as the old Agent.reward, which counted the cells
+of the hand grid for every state, and measures the time per reward of each.
+
+Run from the repository root:
+    python -m benchmarks.bench_reward
+"""
+
+import argparse
+import random
+from time import perf_counter
+
+import rules
+from blazing8s import (
+    AgentPlayer,
+    DoubleQTableAgent,
+    Game,
+    SimpleStrategyPlayer,
+    card_stream,
+    reward_feature_matrix,
+    reward_features,
+)
+
+
+def old_reward(state: tuple) -> float:
+    """Agent.reward before the reward features."""
+    if state[0] == 0:
+        return -100
+    if state[2] == 0:
+        return 100
+    returning = 0
+    returning += state[0] * 2
+    returning -= state[2] * 3
+    cells = rules.hand_cells(state[3])
+    playable_cards = (cells & rules.PLAYABLE_CELLS[rules.cell(*state[1])]).bit_count()
+    jackss = (cells & rules.NUMBER_CELLS[11]).bit_count()
+    eights = (cells & rules.NUMBER_CELLS[8]).bit_count()
+    swaps = (cells & rules.NUMBER_CELLS[1]).bit_count()
+    returning += playable_cards
+    returning += jackss * 3
+    returning += eights * 2
+    if swaps == 1:
+        returning += 5
+    if not state[5]:
+        returning += 4
+    return returning
+
+
+def record_updates(games: int) -> tuple[list, list]:
+    """The next states of the updates of an AgentPlayer and the features the player computed for them."""
+    states = []
+    features = []
+
+    class RecordingPlayer(AgentPlayer):
+        def reward_features(self, top, enemy_hand_length, last_player_played):
+            state = self.get_state(top, enemy_hand_length, False, last_player_played)
+            states.append(state)
+            features.append(super().reward_features(top, enemy_hand_length, last_player_played))
+            return features[-1]
+
+    agent = DoubleQTableAgent(epsilon=0.1, alpha=0.35, gamma=1)
+    player1 = RecordingPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    for _ in range(games):
+        Game(player1, player2).start()
+    return states, features
+
+
+def ns_per_reward(fn, items: list) -> float:
+    best = None
+    for _ in range(5):
+        t1 = perf_counter()
+        for item in items:
+            fn(item)
+        elapsed = (perf_counter() - t1) / len(items) * 1e9
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    card_stream.seed(args.seed)
+
+    states, features = record_updates(args.games)
+    agent = DoubleQTableAgent()
+    expected = [old_reward(state) for state in states]
+    checks = {
+        "player features": [agent.feature_reward(f) for f in features],
+        "reward": [agent.reward(state) for state in states],
+        "batch": agent.rewards(reward_feature_matrix(states)),
+    }
+    for name, rewards in checks.items():
+        same = all(
+            type(a) is type(b) and a == b for a, b in zip(rewards, expected, strict=True)
+        )
+        if not same:
+            raise Exception(f"The rewards from the {name} are different")
+    print(f"{len(states)} rewards are the same")
+
+    print(f"old reward:       {ns_per_reward(old_reward, states):7.0f} ns")
+    print(f"reward:           {ns_per_reward(agent.reward, states):7.0f} ns")
+    print(f"player features:  {ns_per_reward(agent.feature_reward, features):7.0f} ns")
+    t1 = perf_counter()
+    matrix = reward_feature_matrix(states)
+    t2 = perf_counter()
+    agent.rewards(matrix)
+    t3 = perf_counter()
+    print(f"batch features:   {(t2 - t1) / len(states) * 1e9:7.0f} ns")
+    print(f"batch rewards:    {(t3 - t2) / len(states) * 1e9:7.0f} ns")
@@ -0,0 +1,128 @@
+"""
+Compares the card by card playability checks the players and the reward used to do
+with the precomputed tables in rules.py, on the decisions of recorded games.
+Every result is checked to be the same as the one of the old check.
+
+Run from the repository root:
+    python -m benchmarks.bench_rules
+"""
+
+import argparse
+import random
+from time import perf_counter
+
+import rules
+from blazing8s import (
+    Card,
+    Game,
+    Hand,
+    RandomPlayer,
+    SimpleStrategyPlayer,
+    possible_suite,
+    top_cell,
+)
+
+
+def old_possible_actions(hand: list[Card], top: Card) -> list:
+    """The possible actions of BetterAgentPlayer before the rules tables."""
+    possible_actions = []
+    for card in hand:
+        if (
+            card.suite == top.suite
+            or card.number == top.number
+            or card.number == 8
+            or card.number == 1
+        ):
+            suites = []
+            if card.number != 8 and card.number != 1:
+                suites.append(card.suite)
+            elif card.number == 1:
+                suites = [None]
+            else:
+                suites = possible_suite
+            for suite in suites:
+                play_action = (card.number, suite.value if suite is not None else 0)
+                if play_action not in possible_actions:
+                    possible_actions.append(play_action)
+    return possible_actions
+
+
+def new_possible_actions(hand: Hand, top: Card) -> list:
+    return rules.playable_actions(hand.cells, top_cell(top))
+
+
+def old_playable_cells(state: tuple) -> int:
+    """The playable card count of Agent.reward before the rules tables."""
+    playable_cards = 0
+    top_num, top_suite = state[1]
+    for card_num in range(1, 14):
+        for card_suite in range(5):
+            if state[3][card_num - 1][card_suite] == 0:
+                continue
+            if (
+                card_num == top_num
+                or card_suite == top_suite
+                or card_num == 8
+                or card_num == 1
+            ):
+                playable_cards += 1
+    return playable_cards
+
+
+def new_playable_cells(state: tuple) -> int:
+    cells = rules.hand_cells(state[3])
+    return (cells & rules.PLAYABLE_CELLS[rules.cell(*state[1])]).bit_count()
+
+
+class RecordingPlayer(SimpleStrategyPlayer):
+    def __init__(self, name: str, decisions: list):
+        super().__init__(name)
+        self.decisions = decisions
+
+    def choose_card(self, top, enemy_hand_length, drew, last_player_played):
+        self.decisions.append((Hand(self.hand), Card(top.number, top.suite)))
+        return super().choose_card(top, enemy_hand_length, drew, last_player_played)
+
+
+def time_calls(fn, inputs: list) -> float:
+    t1 = perf_counter()
+    for args in inputs:
+        fn(*args)
+    return (perf_counter() - t1) / len(inputs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    decisions = []
+    player1 = RecordingPlayer("Player 1", decisions)
+    player2 = RandomPlayer("Player 2")
+    for i in range(args.games):
+        Game(player1, player2, seed=args.seed + i).start()
+    states = [
+        ((0, top.to_tuple(), len(hand), hand.get_grid(), False, False),)
+        for hand, top in decisions
+    ]
+
+    for hand, top in decisions:
+        if sorted(old_possible_actions(hand, top)) != new_possible_actions(hand, top):
+            raise Exception(f"Different actions for {[str(c) for c in hand]} on {top}")
+    for (state,) in states:
+        if old_playable_cells(state) != new_playable_cells(state):
+            raise Exception(f"Different playable count for {state}")
+
+    print(f"{len(decisions)} decisions")
+    for name, old, new, inputs in [
+        ("possible actions", old_possible_actions, new_possible_actions, decisions),
+        ("reward playable", old_playable_cells, new_playable_cells, states),
+    ]:
+        new_time = min(time_calls(new, inputs) for _ in range(5))
+        old_time = min(time_calls(old, inputs) for _ in range(5))
+        print(
+            f"{name:18} old: {old_time * 1e9:8.0f} ns  new: {new_time * 1e9:8.0f} ns"
+            f"  {old_time / new_time:5.2f}x"
+        )
@@ -0,0 +1,69 @@
+"""
+Compares q tables keyed on optimized state tuples with q tables keyed on packed bytes keys
+(see state_keys.py): lookup speed and the bytes used per table entry.
+
+Run from the repository root:
+    python -m benchmarks.bench_state_keys
+"""
+
+import argparse
+import random
+import sys
+from time import perf_counter
+
+from blazing8s import BetterAgentPlayer, DoubleQTableAgent, Game, SimpleStrategyPlayer
+from state_keys import pack_state, unpack_state
+
+
+def deep_size(obj) -> int:
+    """Size of obj and everything it references, not counting the shared small ints and bools."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        size += sum(deep_size(o) for o in obj if isinstance(o, (tuple, float)))
+    elif isinstance(obj, dict):
+        size += sum(deep_size(k) + deep_size(v) for k, v in obj.items())
+    elif isinstance(obj, float):
+        pass
+    return size
+
+
+def time_lookups(q_table: dict, keys: list) -> float:
+    t1 = perf_counter()
+    for k in keys:
+        q_table[k]
+    return (perf_counter() - t1) / len(keys)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    agent = DoubleQTableAgent(epsilon=0.04, alpha=0.35, gamma=1)
+    player1 = BetterAgentPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    for _ in range(args.games):
+        Game(player1, player2).start()
+
+    packed_table = agent.q_table1
+    tuple_table = {unpack_state(k): v for k, v in packed_table.items()}
+    # Fresh, equal key objects, so every lookup has to hash the key like it does during training.
+    packed_keys = [pack_state(unpack_state(k)) for k in packed_table]
+    tuple_keys = [unpack_state(k) for k in packed_table]
+    random.shuffle(packed_keys)
+    random.shuffle(tuple_keys)
+
+    print(f"{len(packed_table)} states")
+    for name, q_table, keys in [
+        ("tuple keys", tuple_table, tuple_keys),
+        ("packed keys", packed_table, packed_keys),
+    ]:
+        lookup = min(time_lookups(q_table, keys) for _ in range(5))
+        key_bytes = sum(deep_size(k) for k in q_table) / len(q_table)
+        entry_bytes = deep_size(q_table) / len(q_table)
+        print(
+            f"{name:12} lookup: {lookup * 1e9:6.0f} ns"
+            f"  key: {key_bytes:6.0f} bytes  entry: {entry_bytes:6.0f} bytes"
+        )
@@ -0,0 +1,231 @@
+"""
+Benchmark suite for the engines, the agents and the q table files.
+Every benchmark runs with a fixed seed and the results are written as JSON.
+When a baseline file is given, every result is compared with it and the ones that got
+more than --tolerance worse are flagged.
+
+Run from the repository root:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --output results.json --baseline baseline.json
+Store a new baseline with --save-baseline baseline.json.
+
+The exit code is 1 when a regression was flagged.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+from blazing8s import (
+    Agent,
+    AgentPlayer,
+    BetterAgentPlayer,
+    DoubleQTableAgent,
+    Game,
+    RandomPlayer,
+    SimpleStrategyPlayer,
+    card_stream,
+)
+from game import DiscordGame, RandomPlayer as DiscordRandomPlayer
+from state_keys import canonical_cache
+
+SEED = 0
+
+# Metrics where a lower value is better. Everything else is a rate where higher is better.
+LOWER_IS_BETTER = ("_ns", "_seconds")
+
+
+def make_player(kind: str, name: str):
+    if kind == "random":
+        return RandomPlayer(name)
+    if kind == "simple":
+        return SimpleStrategyPlayer(name)
+    return BetterAgentPlayer(name, agent=DoubleQTableAgent(epsilon=0.04))
+
+
+def bench_engine(games: int) -> dict:
+    results = {}
+    for kind1, kind2 in itertools.combinations_with_replacement(
+        ["random", "simple", "agent"], 2
+    ):
+        random.seed(SEED)
+        card_stream.seed(SEED)
+        canonical_cache.clear()
+        player1 = make_player(kind1, "Player 1")
+        player2 = make_player(kind2, "Player 2")
+        turns = 0
+        t1 = perf_counter()
+        for _ in range(games):
+            game = Game(player1, player2)
+            game.start()
+            turns += game.turns
+        elapsed = perf_counter() - t1
+        results[f"game_{kind1}_vs_{kind2}_games_per_s"] = games / elapsed
+        results[f"game_{kind1}_vs_{kind2}_turns_per_s"] = turns / elapsed
+
+    random.seed(SEED)
+    t1 = perf_counter()
+    for i in range(games):
+        DiscordGame(
+            DiscordRandomPlayer("Player 1"), DiscordRandomPlayer("Player 2"), SEED + i
+        ).loop()
+    results["discord_random_vs_random_games_per_s"] = games / (perf_counter() - t1)
+    return results
+
+
+def record_transitions(games: int) -> list:
+    """Plays games with an AgentPlayer and records the (state, possible actions, action, next state) it sees."""
+    transitions = []
+
+    class RecordingAgent(DoubleQTableAgent):
+        def choose_action(self, state, possible_actions):
+            self.possible_actions = list(possible_actions)
+            return super().choose_action(state, possible_actions)
+
+        def update_q_value(self, state, action, next_state, reward=None):
+            transitions.append((state, self.possible_actions, action, next_state))
+            super().update_q_value(state, action, next_state, reward)
+
+    agent = RecordingAgent(epsilon=1)
+    player1 = AgentPlayer("Player 1", agent=agent)
+    player2 = RandomPlayer("Player 2")
+    for _ in range(games):
+        Game(player1, player2).start()
+    return transitions
+
+
+def fill(agent, transitions: list, states: int) -> None:
+    """Fills the tables of agent with `states` random states on top of the recorded ones."""
+    for state, _, action, next_state in transitions:
+        agent.update_q_value(state, action, next_state)
+    if isinstance(agent, DoubleQTableAgent):
+        tables = [agent.q_table1, agent.q_table2]
+    else:
+        tables = [agent.q_table]
+    for i in range(states):
+        key = bytes([i % 11, 2, 1, 5, 0, 1]) + i.to_bytes(4, "little")
+        for q_table in tables:
+            q_table[key] = {(): random.random()}
+
+
+def bench_agents(table_sizes: list[int], samples: int) -> dict:
+    random.seed(SEED)
+    card_stream.seed(SEED)
+    transitions = record_transitions(200)[:samples]
+    results = {}
+    for cls in [Agent, DoubleQTableAgent]:
+        for size in table_sizes:
+            random.seed(SEED)
+            canonical_cache.clear()
+            agent = cls(epsilon=0, alpha=0.35, gamma=1)
+            fill(agent, transitions, size)
+            name = f"{cls.__name__}_{size}"
+
+            t1 = perf_counter()
+            for state, possible_actions, _, _ in transitions:
+                agent.choose_action(state, possible_actions)
+            elapsed = perf_counter() - t1
+            results[f"{name}_choose_action_ns"] = elapsed / len(transitions) * 1e9
+
+            t1 = perf_counter()
+            for state, _, action, next_state in transitions:
+                agent.update_q_value(state, action, next_state)
+            elapsed = perf_counter() - t1
+            results[f"{name}_update_q_value_ns"] = elapsed / len(transitions) * 1e9
+    return results
+
+
+def bench_q_table_files(states: int) -> dict:
+    random.seed(SEED)
+    agent = DoubleQTableAgent()
+    fill(agent, [], states)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "table")
+        for mapped in [False, True]:
+            name = "mapped" if mapped else "pickle"
+            t1 = perf_counter()
+            agent.write_q_table(file_name, mapped=mapped)
+            results[f"q_table_{name}_{states}_save_seconds"] = perf_counter() - t1
+            t1 = perf_counter()
+            DoubleQTableAgent(file_name=file_name, mapped=mapped)
+            results[f"q_table_{name}_{states}_load_seconds"] = perf_counter() - t1
+    return results
+
+
+def best(runs: list[dict]) -> dict:
+    """The best value of every metric over several runs, which filters out most of the noise of a busy machine."""
+    results = {}
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        results[name] = min(values) if name.endswith(LOWER_IS_BETTER) else max(values)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline["results"]:
+            continue
+        old = baseline["results"][name]
+        if name.endswith(LOWER_IS_BETTER):
+            change = (value - old) / old
+        else:
+            change = (old - value) / old
+        marker = "REGRESSION" if change > tolerance else ""
+        print(f"{name:50} {old:14.4g} {value:14.4g} {-change * 100:+7.1f}% {marker}")
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--table-sizes", type=int, nargs="+", default=[0, 10000, 100000])
+    parser.add_argument("--file-states", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--save-baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.repeat):
+        run = {}
+        run.update(bench_engine(args.games))
+        run.update(bench_agents(args.table_sizes, args.samples))
+        run.update(bench_q_table_files(args.file_states))
+        runs.append(run)
+    results = best(runs)
+    report = {
+        "seed": SEED,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "args": vars(args),
+        "results": results,
+    }
+    for name, value in results.items():
+        print(f"{name:50} {value:14.4g}")
+    for path in [args.output, args.save_baseline]:
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        print(f"{'benchmark':50} {'baseline':>14} {'now':>14} {'change':>8}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            sys.exit(1)
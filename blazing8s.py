@@ -18,17 +18,36 @@ The rules of the game are as follows:
 6. The player with no cards left in his hand wins.
 """
 
+import os
 import random
 from enum import Enum
-from typing import Self
+from types import MappingProxyType
+from typing import Callable, Self
 import pickle
 
-# easy memoization
-from functools import lru_cache
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from instrumentation import Instrumentation
+import rules
+from q_table_file import (
+    EXTENSION,
+    LoadSummary,
+    MappedQTable,
+    hand_size_at_most,
+    load_q_table,
+    write_q_table_file,
+)
+from state_keys import CanonicalCache, canonical_cache
 
 
 HAND_SIZE_CUTOFF = 11
 
+# The actions of a state that is not in a q table, shared and read only.
+NO_ACTIONS = MappingProxyType({})
+
 possible_cards = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 13]
 
 
@@ -44,9 +63,30 @@ possible_suite = [Suite.RED, Suite.BLUE, Suite.GREEN, Suite.YELLOW]
 
 
 class Card:
-    def __init__(self, number: int, suite: Suite | None):
-        self.number = number
-        self.suite = suite
+    """
+    Cards are immutable and interned: Card(number, suite) returns the same object every time,
+    so dealing cards and replacing the top card do not allocate.
+    Swaps and 8s are held without a suite. An 8 is played as Card(8, color) with the color it changes to,
+    see Hand.held.
+    """
+
+    __slots__ = ("number", "suite")
+    interned = {}
+
+    def __new__(cls, number: int, suite: Suite | None):
+        card = Card.interned.get((number, suite))
+        if card is None:
+            card = super().__new__(cls)
+            object.__setattr__(card, "number", number)
+            object.__setattr__(card, "suite", suite)
+            Card.interned[(number, suite)] = card
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards are immutable, use Card(number, suite) for another card")
+
+    def __reduce__(self):
+        return Card, (self.number, self.suite)
 
     def __str__(self):
         # color = {1: "Red", 2: "Blue", 3: "Green", 4: "Yellow"}
@@ -60,24 +100,198 @@ class Card:
 
     @staticmethod
     def from_tuple(tup: tuple):
-        return Card(tup[0], tup[1])
+        return Card(tup[0], suite_map[tup[1]])
+
+
+class Hand(list):
+    """
+    A list of cards that also keeps the 13x5 count grid used by the agent state up to date.
+    Row `number - 1`, column `suite.value`, with column 0 for swaps and 8s since their
+    color is only chosen when they are played.
+    Only append and remove keep the grid in sync, so those are the only ways cards
+    should enter or leave a hand. Swapping two hands swaps their grids along with them.
+    `cells` is the set of grid cells with at least one card, see rules.py, and `distinct[number - 1]`
+    the number of those cells in a row, which the reward counts for Js, 8s and swaps.
+    """
+
+    def __init__(self, cards: list[Card] = ()):
+        super().__init__()
+        self.rows = [(0, 0, 0, 0, 0)] * 13
+        self.suite_totals = [0 for _ in range(5)]
+        self.cells = 0
+        self.distinct = [0] * 13
+        self.grid = None
+        for card in cards:
+            self.append(card)
+
+    @staticmethod
+    def held(card: Card) -> Card:
+        """The card in the hand that is played as card, which is the card itself except for colored swaps and 8s."""
+        if card.number == 1 or card.number == 8:
+            return Card(card.number, None)
+        return card
+
+    @staticmethod
+    def cell(card: Card) -> tuple[int, int]:
+        if card.suite is None or card.number == 1 or card.number == 8:
+            return card.number - 1, 0
+        return card.number - 1, card.suite.value
+
+    def update(self, card: Card, count: int) -> None:
+        number, suite = Hand.cell(card)
+        row = self.rows[number]
+        self.rows[number] = row[:suite] + (row[suite] + count,) + row[suite + 1 :]
+        self.suite_totals[suite] += count
+        if row[suite] + count:
+            if not row[suite]:
+                self.cells |= 1 << (number * 5 + suite)
+                self.distinct[number] += 1
+        else:
+            self.cells &= ~(1 << (number * 5 + suite))
+            self.distinct[number] -= 1
+        self.grid = None
+
+    def append(self, card: Card) -> None:
+        super().append(card)
+        self.update(card, 1)
+
+    def remove(self, card: Card) -> None:
+        card = Hand.held(card)
+        super().remove(card)
+        self.update(card, -1)
+
+    def get_grid(self) -> tuple:
+        # Only rebuilt after the hand changed, so repeated calls in a turn share one tuple.
+        if self.grid is None:
+            self.grid = tuple(self.rows)
+        return self.grid
+
+
+# Every card a random card can be, all equally likely. Swaps and 8s have no suite until they are played.
+card_choices = [
+    Card(number, None if number == 1 or number == 8 else suite)
+    for number in possible_cards
+    for suite in possible_suite
+]
+
+
+class CardStream:
+    """
+    A stream of random cards with its own generator.
+    The cards are generated buffer_size at a time (with NumPy when it is installed),
+    so a draw is a list lookup instead of two random.choice calls.
+    Two streams with the same seed give the same cards.
+    """
+
+    def __init__(self, seed: int | None = None, buffer_size: int = 1024):
+        self.buffer_size = buffer_size
+        self.seed(seed)
+
+    def seed(self, seed: int | None = None) -> None:
+        if np is not None:
+            self.generator = np.random.default_rng(seed)
+        else:
+            self.generator = random.Random(seed)
+        self.buffer = []
+        self.cursor = 0
+
+    def refill(self) -> None:
+        if np is not None:
+            indices = self.generator.integers(
+                0, len(card_choices), self.buffer_size
+            ).tolist()
+        else:
+            indices = self.generator.choices(
+                range(len(card_choices)), k=self.buffer_size
+            )
+        self.buffer = [card_choices[i] for i in indices]
+        self.cursor = 0
+
+    def draw(self) -> Card:
+        if self.cursor == len(self.buffer):
+            self.refill()
+        card = self.buffer[self.cursor]
+        self.cursor += 1
+        return card
+
+
+# Used by games that are not given a seed. Reseeded in forked processes so they do not all deal the same cards.
+card_stream = CardStream()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=card_stream.seed)
 
 
 def get_random_card():
-    num = random.choice(possible_cards)
-    suite = random.choice(possible_suite)
-    if num == 1 or num == 8:
-        return Card(num, None)
-    return Card(num, suite)
+    return card_stream.draw()
+
+
+def card_cell(card: Card) -> int:
+    """The cell of card in the hand grid, see rules.py."""
+    number, suite = Hand.cell(card)
+    return number * 5 + suite
+
+
+def action_card(action: tuple) -> Card:
+    """The card to play for a (number, suite) action. A swap ignores the suite, an 8 is played as that color."""
+    if action[0] == 1:
+        return Card(1, None)
+    return Card(action[0], suite_map[action[1]])
+
+
+def top_cell(top: Card) -> int:
+    """The cell of the top card, which keeps its color even when it is a swap or an 8."""
+    return (top.number - 1) * 5 + (0 if top.suite is None else top.suite.value)
+
+
+# Agent.reward only depends on these features of a state, in this order.
+REWARD_FEATURES = (
+    "enemy_hand_length",
+    "hand_size",
+    "playable",
+    "jacks",
+    "eights",
+    "swaps",
+    "enemy_played_last",
+)
+
+
+def reward_features(state: tuple) -> tuple:
+    """
+    The reward features of a state, counted from its hand grid.
+    AgentPlayer.reward_features gives the same tuple from the counts its hand keeps up to date.
+    Every count is of the distinct (number, suite) cells in the hand, not of the cards.
+    """
+    cells = rules.hand_cells(state[3])
+    return (
+        state[0],
+        state[2],
+        (cells & rules.PLAYABLE_CELLS[rules.cell(*state[1])]).bit_count(),
+        (cells & rules.NUMBER_CELLS[11]).bit_count(),
+        (cells & rules.NUMBER_CELLS[8]).bit_count(),
+        (cells & rules.NUMBER_CELLS[1]).bit_count(),
+        state[5],
+    )
+
+
+def reward_feature_matrix(states: list):
+    """
+    The reward features of many states, one row per state, for Agent.rewards.
+    An int64 array of shape (len(states), 7) with NumPy, a list of tuples without it.
+    """
+    features = [reward_features(state) for state in states]
+    if np is None:
+        return features
+    return np.array(features, dtype=np.int64).reshape(len(features), len(REWARD_FEATURES))
 
 
 class Player:
     def __init__(self, name: str):
         self.name = name
-        self.hand: list[Card] = []
+        self.hand: Hand = Hand()
 
-    def draw(self):
-        card = get_random_card()
+    def draw(self, card: Card | None = None):
+        if card is None:
+            card = get_random_card()
         self.hand.append(card)
 
     def play(self, card: Card):
@@ -91,14 +305,10 @@ class Player:
         print(f"Enemy hand length: {enemy_hand_length} cards")
         print("Your hand:")
         playable_cards = {}
+        playable = rules.PLAYABLE[top_cell(top)]
         for i, card in enumerate(self.hand):
             print(f"{i}: {card}", end=" ")
-            if (
-                card.suite == top.suite
-                or card.number == top.number
-                or card.number == 8
-                or card.number == 1
-            ):
+            if playable[card_cell(card)]:
                 print("Playable")
                 playable_cards[i] = card
             else:
@@ -122,8 +332,7 @@ class Player:
             return None
         choice = self.hand[int(choice)]
         if choice.number == 8:
-            suite = self.choose_color()
-            choice.suite = suite
+            choice = Card(8, self.choose_color())
         return choice
 
     def choose_color(self) -> str:
@@ -150,16 +359,12 @@ class RandomPlayer(Player):
         self, top: Card, enemy_hand_length: int, drew: bool, last_player_played
     ) -> Card:
         playable_cards = [] if self.GOOD_RANDOM else [None]
+        playable = rules.PLAYABLE[top_cell(top)]
         for card in self.hand:
             if card.number == 8:
                 suite = random.choice(possible_suite)
-                card.suite = suite
-            if (
-                card.suite == top.suite
-                or card.number == top.number
-                or card.number == 8
-                or card.number == 1
-            ):
+                card = Card(8, suite)
+            if playable[card_cell(card)]:
                 playable_cards.append(card)
         if len(playable_cards) == 0:
             return None
@@ -173,19 +378,8 @@ class SimpleStrategyPlayer(Player):
     def choose_card(
         self, top: Card, enemy_hand_length: int, drew: bool, last_player_played
     ) -> Card:
-        playable_cards = []
-        for card in self.hand:
-            if card.number == 8:
-                # suite = random.choice(possible_suite)
-                # card.suite = suite
-                pass
-            if (
-                card.suite == top.suite
-                or card.number == top.number
-                or card.number == 8
-                or card.number == 1
-            ):
-                playable_cards.append(card)
+        playable = rules.PLAYABLE[top_cell(top)]
+        playable_cards = [card for card in self.hand if playable[card_cell(card)]]
         if len(playable_cards) == 0:
             return None
         # First try to play the king of the same suite.
@@ -212,35 +406,55 @@ class SimpleStrategyPlayer(Player):
         if other_suite is not None:
             return other_suite
         # If there are no normal cards of the same suite, play a 8 and swap to the suite with the most cards.
-        if 8 in [card.number for card in playable_cards]:
-            max_count = max(suite_counts)
-            max_idx = suite_counts.index(max_count)
-            card.suite = suite_map[max_idx]
-            return card
+        for card in playable_cards:
+            if card.number == 8:
+                max_count = max(suite_counts)
+                max_idx = suite_counts.index(max_count)
+                return Card(8, suite_map[max_idx])
         # Otherwise, play a random card.
         return random.choice(playable_cards)
 
 
 class Game:
-    def __init__(self, player1: Player, player2: Player, verbose: bool = False):
+    def __init__(
+        self,
+        player1: Player,
+        player2: Player,
+        verbose: bool = False,
+        instrumentation: Instrumentation | None = None,
+        seed: int | None = None,
+    ):
+        """
+        A game with a seed has its own generators for the cards and for who starts,
+        so the same seed deals the same game. Without one the game uses the global random module
+        and the shared card_stream. The choices of the players use their own randomness.
+        """
         self.player1 = player1
         self.player2 = player2
-        self.current_player = player1 if random.random() < 0.5 else player2
+        if seed is None:
+            self.rng = random
+            self.cards = card_stream
+        else:
+            self.rng = random.Random(seed)
+            self.cards = CardStream(seed)
+        self.current_player = player1 if self.rng.random() < 0.5 else player2
         # self.current_player = player1
-        self.top = get_random_card()
+        self.top = self.cards.draw()
         self.turns = 0
         self.verbose = verbose
         self.last_player_played = False
+        if instrumentation is not None:
+            instrumentation.attach_game(self)
 
     def start(self):
-        self.player1.hand = []
-        self.player2.hand = []
+        self.player1.hand = Hand()
+        self.player2.hand = Hand()
         for _ in range(5):
-            self.player1.draw()
-            self.player2.draw()
-        self.top = get_random_card()
+            self.player1.draw(self.cards.draw())
+            self.player2.draw(self.cards.draw())
+        self.top = self.cards.draw()
         while self.top.number in [1, 8]:
-            self.top = get_random_card()
+            self.top = self.cards.draw()
         self.last_player_played = False
         while True:
             # print(f"It's {self.current_player.name}'s turn.")
@@ -284,7 +498,7 @@ class Game:
             else:
                 if self.verbose:
                     print(f"{curr_player.name} drew.")
-                self.current_player.draw()
+                self.current_player.draw(self.cards.draw())
                 drew = True
             if isinstance(curr_player, AgentPlayer):
                 curr_player.update_reward(
@@ -325,7 +539,7 @@ class Game:
                 self.switch_player()
         elif card.number == 13:  # Draw one
             self.switch_player()
-            self.current_player.draw()
+            self.current_player.draw(self.cards.draw())
             self.switch_player()
 
         return Card(new_top_number, new_top_color)
@@ -346,92 +560,152 @@ class Agent:
         alpha: float = 0.5,
         gamma: float = 0.95,
         file_name: str | None = None,
+        cache: CanonicalCache | None = None,
+        keep: Callable | None = None,
     ):
         self.epsilon = epsilon
         self.alpha = alpha
         self.gamma = gamma
+        self.cache = cache if cache is not None else canonical_cache
         self.q_table = {}
         self.q_table_attempts = 0
         self.q_table_hits = 0
+        # When set to a set, every update adds (0, state) to it. Used by checkpoint.Checkpointer.
+        self.dirty = None
         self.file_name = file_name
         if file_name is not None:
             path = os.path.join("q_tables", file_name)
-            with open(path, "rb") as f:
-                self.q_table = pickle.load(f)
-            # Drop items in q_table where the hand_size is greater than 50.
-            to_delete = []
-            for k in self.q_table:
-                if k[2] > HAND_SIZE_CUTOFF:
-                    to_delete.append(k)
-            print(f"Cut {len(to_delete)} items from q_table")
-            print(f"That is {len(to_delete) / len(self.q_table) * 100}%")
-            # Display a histogram of the hand sizes.
-            hand_sizes = [k[2] for k in self.q_table]
-            # plt.hist(hand_sizes, bins=max(hand_sizes) - min(hand_sizes))
-            # plt.show()
-            for k in to_delete:
-                del self.q_table[k]
+            # The mapped file is streamed in, so only the kept states are ever in memory.
+            # A pickled table is unpickled whole before states are dropped, see q_table_file.iter_q_table.
+            if os.path.exists(f"{path}{EXTENSION}"):
+                path = f"{path}{EXTENSION}"
+            # Drop items in q_table where the hand_size is greater than HAND_SIZE_CUTOFF while loading.
+            summary = LoadSummary()
+            self.q_table = load_q_table(
+                path,
+                keep=keep if keep is not None else hand_size_at_most(HAND_SIZE_CUTOFF),
+                summary=summary,
+            )
+            print(summary)
+
+    def write_q_table(self, file_name: str | None = None, mapped: bool = False):
+        """
+        Writes the table to q_tables/<file_name>, or to q_tables/<file_name>.qt in the mapped format.
+        A pickled write removes the mapped file, which would otherwise be loaded in its place.
+        """
+        if file_name is None:
+            file_name = self.file_name
+        path = os.path.join("q_tables", file_name)
+        if mapped:
+            write_q_table_file(self.q_table, f"{path}{EXTENSION}")
+            return
+        with open(path, "wb+") as f:
+            pickle.dump(self.q_table, f)
+        if os.path.exists(f"{path}{EXTENSION}"):
+            os.remove(f"{path}{EXTENSION}")
 
     def get_q_value(self, state: tuple, action: tuple) -> float:
-        # if state not in self.q_table:
-        #     self.q_table[state] = {}
-        # if action not in self.q_table[state]:
-        #     self.q_table[state][action] = 0
-        # return self.q_table[state][action]
+        # Reads never add to the table, a missing state or action is worth 0.
+        # Only update_q_value creates entries.
         self.q_table_attempts += 1
-        hit = 1
-        sorting_indices = self.get_sorting_indices(state)
-        optimized_state = self.optimize_state(state, sorting_indices)
-        if optimized_state not in self.q_table:
-            self.q_table[optimized_state] = {}
-            hit = 0
+        sorting_indices, optimized_state = self.canonical_key(state)
         optimized_action = self.optimize_action(action, sorting_indices)
-        if optimized_action not in self.q_table[optimized_state]:
-            self.q_table[optimized_state][optimized_action] = 0
-            hit = 0
-        self.q_table_hits += hit
-        return self.q_table[optimized_state][optimized_action]
-
-    def update_q_value(self, state: tuple, action: tuple, next_state: tuple) -> None:
-        reward = self.reward(next_state)
-        predict = self.get_q_value(state, action)
-
-        sorting_indices = self.get_sorting_indices(state)
-        state = self.optimize_state(state, sorting_indices)
+        value = self.q_table.get(optimized_state, NO_ACTIONS).get(optimized_action)
+        if value is None:
+            return 0
+        self.q_table_hits += 1
+        return value
+
+    def update_q_value(
+        self, state: tuple, action: tuple, next_state: tuple, reward: float | None = None
+    ) -> None:
+        # One pass: both states are canonicalized once, each with its own suite order,
+        # and the row of state is read and written once.
+        # A player that keeps the reward features up to date passes the reward of next_state.
+        if reward is None:
+            reward = self.reward(next_state)
+        sorting_indices, state = self.canonical_key(state)
         action = self.optimize_action(action, sorting_indices)
-        next_state = self.optimize_state(next_state, sorting_indices)
+        _, next_state = self.canonical_key(next_state)
 
-        if next_state not in self.q_table:
-            self.q_table[next_state] = {}
-        target = reward + self.gamma * max(self.q_table[next_state].values(), default=0)
-        self.q_table[state][action] += self.alpha * (target - predict)
+        if state not in self.q_table:
+            self.q_table[state] = {}
+        row = self.q_table[state]
+        self.q_table_attempts += 1
+        predict = row.get(action)
+        if predict is None:
+            predict = 0
+        else:
+            self.q_table_hits += 1
+        target = reward + self.gamma * max(
+            self.q_table.get(next_state, NO_ACTIONS).values(), default=0
+        )
+        row[action] = predict + self.alpha * (target - predict)
+        if self.dirty is not None:
+            self.dirty.add((0, state))
 
     def choose_action(self, state: tuple, possible_actions: list) -> tuple:
         if random.random() < self.epsilon:
             return random.choice(possible_actions)
-        else:
-            max_q_value = max(
-                [self.get_q_value(state, action) for action in possible_actions]
-            )
-            best_actions = [
-                action
-                for action in possible_actions
-                if self.get_q_value(state, action) == max_q_value
-            ]
-            return random.choice(best_actions)
+        return self.best_action(
+            possible_actions, self.action_values(state, possible_actions)
+        )
 
-    def get_sorting_indices(self, state) -> tuple:
-        suite_counts = [0 for _ in range(5)]
-        for row in state[3]:
-            for i in range(5):
-                suite_counts[i] += row[i]
+    def action_values(self, state: tuple, possible_actions: list) -> list:
+        """
+        The q value of every action in possible_actions, with the state canonicalized and its row fetched once.
+        Like get_q_value, this never adds to the table.
+        """
+        sorting_indices, optimized_state = self.canonical_key(state)
+        row = self.q_table.get(optimized_state, NO_ACTIONS)
+        hits = 0
+        values = []
+        for action in possible_actions:
+            if action:
+                optimized_action = (action[0], sorting_indices.index(action[1]))
+            else:
+                optimized_action = action
+            value = row.get(optimized_action)
+            if value is None:
+                value = 0
+            else:
+                hits += 1
+            values.append(value)
+        self.q_table_attempts += len(possible_actions)
+        self.q_table_hits += hits
+        return values
 
-        sorting_indices = sorted(
-            range(len(suite_counts)), key=lambda k: suite_counts[k]
+    @staticmethod
+    def best_action(possible_actions: list, values: list) -> tuple:
+        """The action with the highest value, ties are broken at random."""
+        best_value = max(values)
+        return random.choice(
+            [action for action, value in zip(possible_actions, values) if value == best_value]
+        )
+
+    def get_sorting_indices(self, state) -> tuple:
+        # The suites ordered by how many cards of them are in the hand, see CanonicalCache.
+        return self.cache.lookup(state[3])[0]
+
+    def canonical_key(self, state) -> tuple[tuple, bytes]:
+        # The sorting indices of the hand and the q table key of state, from one cache lookup.
+        # The q tables are keyed on the packed optimized state, see state_keys.py.
+        # The key is pack_state(self.optimize_state(state, sorting_indices)) with the hand part cached.
+        sorting_indices, hand = self.cache.lookup(state[3])
+        return sorting_indices, (
+            bytes(
+                (
+                    state[0],
+                    state[1][0],
+                    sorting_indices.index(state[1][1]),
+                    state[2],
+                    state[4],
+                    state[5],
+                )
+            )
+            + hand
         )
-        return tuple(sorting_indices)
 
-    @lru_cache(maxsize=1000)
     def optimize_state(self, state, sorting_indices):
         new_hand = tuple(state[3][j][i] for i in sorting_indices for j in range(13))
 
@@ -457,75 +731,61 @@ class Agent:
             enemy_last_played_last,
         )
         """
+        return self.feature_reward(reward_features(state))
 
-        def inner(state):
-            if state[0] == 0:
-                # The enemy has no cards left so he won.
-                # print('lost')
-                return -100
-            if state[2] == 0:
-                # The agent has no cards left so he won.
-                # print('won')
-                return 100
-            # return 0
-            returning = 0
-            # More cards in the enemy's hand is better.
-            returning += state[0] * 2
-            # More cards in the agent's hand is worse.
-            returning -= state[2] * 3
-            playable_cards = 0  # Get the number of playable cards.
-            jackss = 0  # Get the number of J in the agent's hand.
-            eights = 0  # Get the number of 8 in the agent's hand.
-            swaps = 0  # Get the number of 1 in the agent's hand.
-            top_num = state[1][0]
-            top_suite = state[1][1]
-
-            for card_num in range(1, 14):
-                for card_suite in range(5):
-                    if state[3][card_num - 1][card_suite] == 0:
-                        continue
-                    if (
-                        card_num == top_num
-                        or card_suite == top_suite
-                        or card_num == 8
-                        or card_num == 1
-                    ):
-                        playable_cards += 1
-                    if card_num == 11:
-                        jackss += 1
-                    if card_num == 8:
-                        eights += 1
-                    if card_num == 1:
-                        swaps += 1
-            # print(len(state[3]))
-            # print(playable_cards)
-            # print(returning)
-            # print(returning)
-            # print()
-            returning += playable_cards
-            # Get the number of J in the agent's hand.
-            returning += jackss * 3
-            # Get the number of 8 in the agent's hand.
-            returning += eights * 2
-            # Get the number of 1 in the agent's hand.
-            if swaps == 1:
-                returning += 5
-
-            # If the enemy agent didn't play last, that's good.
-            if not state[5]:
-                returning += 4
-            else:
-                pass
-            return returning
-
-            return returning
-
-        # i = inner(state)
-        # if abs(i) > 100:
-        #     print(i)
-        #     print(state)
-        #     print()
-        return inner(state)
+    @staticmethod
+    def feature_reward(features: tuple) -> float:
+        """The reward of a state from its reward features, see REWARD_FEATURES."""
+        enemy_hand_length, hand_size, playable_cards, jacks, eights, swaps, enemy_played_last = (
+            features
+        )
+        if enemy_hand_length == 0:
+            # The enemy has no cards left so he won.
+            return -100
+        if hand_size == 0:
+            # The agent has no cards left so he won.
+            return 100
+        returning = 0
+        # More cards in the enemy's hand is better.
+        returning += enemy_hand_length * 2
+        # More cards in the agent's hand is worse.
+        returning -= hand_size * 3
+        # Get the number of playable cards.
+        returning += playable_cards
+        # Get the number of J in the agent's hand.
+        returning += jacks * 3
+        # Get the number of 8 in the agent's hand.
+        returning += eights * 2
+        # Get the number of 1 in the agent's hand.
+        if swaps == 1:
+            returning += 5
+        # If the enemy agent didn't play last, that's good.
+        if not enemy_played_last:
+            returning += 4
+        return returning
+
+    def rewards(self, features) -> list:
+        """
+        The rewards of a batch of states from their reward features, see reward_feature_matrix.
+        The same values as feature_reward, computed on the whole array at once with NumPy.
+        """
+        if np is None or not isinstance(features, np.ndarray):
+            return [self.feature_reward(tuple(row)) for row in features]
+        enemy_hand_length, hand_size, playable_cards, jacks, eights, swaps, enemy_played_last = (
+            features.T
+        )
+        returning = (
+            enemy_hand_length * 2
+            - hand_size * 3
+            + playable_cards
+            + jacks * 3
+            + eights * 2
+            + (swaps == 1) * 5
+            + (enemy_played_last == 0) * 4
+        )
+        returning = np.where(hand_size == 0, 100, returning)
+        returning = np.where(enemy_hand_length == 0, -100, returning)
+        return returning.tolist()
 
 
 class DoubleQTableAgent(Agent):
@@ -535,88 +795,130 @@ class DoubleQTableAgent(Agent):
         alpha: float = 0.5,
         gamma: float = 0.95,
         file_name: str | None = None,
+        cache: CanonicalCache | None = None,
+        mapped: bool = False,
+        keep: Callable | None = None,
+        track_visits: bool = False,
     ):
         self.epsilon = epsilon
         self.alpha = alpha
         self.gamma = gamma
+        self.cache = cache if cache is not None else canonical_cache
         self.q_table1 = {}
         self.q_table2 = {}
         self.q_table_attempts = 0
         self.q_table_hits = 0
+        # When set to a dict, every update is recorded as
+        # (table index, state, action) -> [total change, number of updates].
+        # Used by parallel_training to merge the updates of worker processes.
+        self.changes = None
+        # When set to a set, every update adds (table index, state) to it. Used by checkpoint.Checkpointer.
+        self.dirty = None
+        # When track_visits is set, the number of updates of every state, written along with mapped tables.
+        self.visits = {} if track_visits else None
         self.file_name = file_name
-        if file_name is not None:
+        if mapped and keep is not None:
+            raise ValueError("keep can not be used with mapped tables")
+        if file_name is not None and mapped:
+            # Memory map the tables written by write_q_table(mapped=True) instead of unpickling them.
             print(self.file_name)
-            with open(f"{file_name}_1", "rb") as f:
-                self.q_table1 = pickle.load(f)
-            with open(f"{file_name}_2", "rb") as f:
-                self.q_table2 = pickle.load(f)
+            self.q_table1 = MappedQTable(f"{file_name}_1{EXTENSION}")
+            self.q_table2 = MappedQTable(f"{file_name}_2{EXTENSION}")
+        elif file_name is not None:
+            print(self.file_name)
+            # keep is an optional predicate from q_table_file that drops states while loading.
+            for suffix in ["_1", "_2"]:
+                summary = LoadSummary()
+                path = f"{file_name}{suffix}"
+                if not os.path.exists(path) and os.path.exists(f"{path}{EXTENSION}"):
+                    path = f"{path}{EXTENSION}"
+                q_table = load_q_table(path, keep=keep, summary=summary)
+                if keep is not None:
+                    print(summary)
+                if suffix == "_1":
+                    self.q_table1 = q_table
+                else:
+                    self.q_table2 = q_table
 
     def get_q_value(self, state: tuple, action: tuple) -> float:
-        sorting_indices = self.get_sorting_indices(state)
-        state = self.optimize_state(state, sorting_indices)
+        self.q_table_attempts += 1
+        sorting_indices, state = self.canonical_key(state)
         if random.random() < 0.5:
             q_table = self.q_table1
         else:
             q_table = self.q_table2
-        if state not in q_table:
-            q_table[state] = {}
-        if action not in q_table[state]:
-            q_table[state][action] = 0
-        return q_table[state][action]
-
-    def update_q_value(self, state: tuple, action: tuple, next_state: tuple) -> None:
-        reward = self.reward(next_state)
-        predict = self.get_q_value(state, action)
-
-        sorting_indices = self.get_sorting_indices(state)
-        state = self.optimize_state(state, sorting_indices)
+        value = q_table.get(state, NO_ACTIONS).get(self.optimize_action(action, sorting_indices))
+        if value is None:
+            return 0
+        self.q_table_hits += 1
+        return value
+
+    def update_q_value(
+        self, state: tuple, action: tuple, next_state: tuple, reward: float | None = None
+    ) -> None:
+        # One pass like Agent.update_q_value. The table is picked once, so the prediction,
+        # the bootstrap max and the write all use the same table.
+        if reward is None:
+            reward = self.reward(next_state)
+        sorting_indices, state = self.canonical_key(state)
         action = self.optimize_action(action, sorting_indices)
-        next_state = self.optimize_state(next_state, sorting_indices)
+        _, next_state = self.canonical_key(next_state)
 
         if random.random() < 0.5:
             q_table = self.q_table1
         else:
             q_table = self.q_table2
-        if next_state not in q_table:
-            q_table[next_state] = {}
         if state not in q_table:
             q_table[state] = {}
-        if action not in q_table[state]:
-            q_table[state][action] = 0
-        target = reward + self.gamma * max(q_table[next_state].values(), default=0)
-        q_table[state][action] += self.alpha * (target - predict)
-
-    def choose_action(self, state: tuple, possible_actions: list) -> tuple:
-        sorting_indices = self.get_sorting_indices(state)
-        state = self.optimize_state(state, sorting_indices)
-
-        if random.random() < self.epsilon:
-            return random.choice(possible_actions)
+        row = q_table[state]
+        self.q_table_attempts += 1
+        predict = row.get(action)
+        if predict is None:
+            predict = 0
         else:
-            q_table = self.q_table1.get(state, {})
-            for k, v in self.q_table2.get(state, {}).items():
-                if k not in q_table:
-                    q_table[k] = v
-                else:
-                    q_table[k] += v
-            best_actions = []
-            best_action_value = None
-            for action in possible_actions:
-                action = self.optimize_action(action, sorting_indices)
-                if action not in q_table:
-                    av = 0
-                else:
-                    av = q_table[action]
-                if best_action_value is None or av > best_action_value:
-                    best_action_value = av
-                    best_actions = [action]
-                elif av == best_action_value:
-                    best_actions.append(action)
-            return random.choice(best_actions)
-
-    def write_q_table(self, file_name: str | None = None):
+            self.q_table_hits += 1
+        target = reward + self.gamma * max(
+            q_table.get(next_state, NO_ACTIONS).values(), default=0
+        )
+        change = self.alpha * (target - predict)
+        row[action] = predict + change
+        if self.dirty is not None:
+            self.dirty.add((0 if q_table is self.q_table1 else 1, state))
+        if self.changes is not None:
+            key = (0 if q_table is self.q_table1 else 1, state, action)
+            if key not in self.changes:
+                self.changes[key] = [0, 0]
+            self.changes[key][0] += change
+            self.changes[key][1] += 1
+        if self.visits is not None:
+            self.visits[state] = self.visits.get(state, 0) + 1
+
+    def action_values(self, state: tuple, possible_actions: list) -> list:
+        """
+        The value of every action in possible_actions, which is the sum of its values in both tables.
+        The tables are read in place, so choosing an action never adds anything to them.
+        """
+        sorting_indices, state = self.canonical_key(state)
+        actions1 = self.q_table1.get(state, NO_ACTIONS)
+        actions2 = self.q_table2.get(state, NO_ACTIONS)
+        values = []
+        for action in possible_actions:
+            if action:
+                optimized_action = (action[0], sorting_indices.index(action[1]))
+            else:
+                optimized_action = action
+            values.append(
+                actions1.get(optimized_action, 0) + actions2.get(optimized_action, 0)
+            )
+        return values
+
+    def write_q_table(self, file_name: str | None = None, mapped: bool = False):
         if file_name is None:
             file_name = self.file_name
+        if mapped:
+            write_q_table_file(self.q_table1, f"{file_name}_1{EXTENSION}", self.visits)
+            write_q_table_file(self.q_table2, f"{file_name}_2{EXTENSION}", self.visits)
+            return
         with open(f"{file_name}_1", "wb+") as f:
             pickle.dump(self.q_table1, f)
         with open(f"{file_name}_2", "wb+") as f:
@@ -630,13 +932,14 @@ class AgentPlayer:
         agent: Agent,
     ):
         self.name = name
-        self.hand: list[Card] = []
+        self.hand: Hand = Hand()
         self.agent = agent
         self.last_state = None
         self.last_action = None
 
-    def draw(self):
-        card = get_random_card()
+    def draw(self, card: Card | None = None):
+        if card is None:
+            card = get_random_card()
         self.hand.append(card)
 
     def play(self, card: Card):
@@ -650,33 +953,14 @@ class AgentPlayer:
         state = self.get_state(top, enemy_hand_length, drew, last_player_played)
         self.last_state = state
         draw_action = ()
-        possible_actions = [draw_action]
-        for card in self.hand:
-            if (
-                card.suite == top.suite
-                or card.number == top.number
-                or card.number == 8
-                or card.number == 1
-            ):
-                suites = []
-                if card.number != 8 and card.number != 1:
-                    suites.append(card.suite)
-                else:
-                    suites = possible_suite
-                for suite in suites:
-                    play_action = (card.number, suite.value if suite is not None else 0)
-                    if play_action not in possible_actions:
-                        possible_actions.append(play_action)
+        possible_actions = [draw_action] + rules.playable_actions(
+            self.hand.cells, top_cell(top), expand_swaps=True
+        )
         action = self.agent.choose_action(state, possible_actions)
         self.last_action = action
         if action == draw_action:
             return None
-        idx = -1
-        for i, card in enumerate(self.hand):
-            if card.number == action[0] and card.suite == action[1]:
-                idx = i
-                break
-        return self.hand[idx]
+        return action_card(action)
 
     def get_state(
         self, top: Card, enemy_hand_length: int, drew: bool, last_player_played
@@ -695,14 +979,8 @@ class AgentPlayer:
         # We will represent this as a tuple of the following:
         # ((num_1_suite_1, ..., num_1_suite_4), ..., (num_13_suite_1, ..., num_13_suite_4))
         # where num_i_suite_j is the number of cards of number i and suite j.
-        hand_state = [[0 for _ in range(5)] for _ in range(13)]
-        for card in self.hand:
-            if card.suite is not None:
-                hand_state[card.number - 1][card.suite.value] += 1
-            else:
-                hand_state[card.number - 1][0] += 1
-
-        return tuple(tuple(row) for row in hand_state)
+        # The hand keeps this grid up to date as cards are drawn, played and swapped.
+        return self.hand.get_grid()
 
     def choose_color(self) -> str:
         print("Which color would you like to change to?")
@@ -712,11 +990,30 @@ class AgentPlayer:
         return possible_suite[int(choice)]
 
     def update_reward(self, top, enemy_hand_length, drew, last_player_played) -> None:
+        if self.last_state is None:
+            # The game ended before this player made a decision.
+            return
         new_state = self.get_state(top, enemy_hand_length, drew, last_player_played)
         self.agent.update_q_value(
             self.last_state,
             self.last_action,
             new_state,
+            self.agent.feature_reward(
+                self.reward_features(top, enemy_hand_length, last_player_played)
+            ),
+        )
+
+    def reward_features(self, top: Card, enemy_hand_length: int, last_player_played) -> tuple:
+        """reward_features of the state of this player, from the counts the hand keeps up to date."""
+        distinct = self.hand.distinct
+        return (
+            enemy_hand_length,
+            len(self.hand),
+            (self.hand.cells & rules.PLAYABLE_CELLS[top_cell(top)]).bit_count(),
+            distinct[10],
+            distinct[7],
+            distinct[0],
+            last_player_played,
         )
 
     def __str__(self):
@@ -736,235 +1033,42 @@ class BetterAgentPlayer(AgentPlayer):
             print("Len is 0")
             return None
         draw_action = ()
-        possible_actions = []
-        for card in self.hand:
-            if (
-                card.suite == top.suite
-                or card.number == top.number
-                or card.number == 8
-                or card.number == 1
-            ):
-                suites = []
-                if card.number != 8 and card.number != 1:
-                    suites.append(card.suite)
-                elif card.number == 1:
-                    suites = [None]
-                else:
-                    suites = possible_suite
-                for suite in suites:
-                    play_action = (card.number, suite.value if suite is not None else 0)
-                    if play_action not in possible_actions:
-                        possible_actions.append(play_action)
+        possible_actions = rules.playable_actions(self.hand.cells, top_cell(top))
         if len(possible_actions) == 0:
             self.last_action = draw_action
             return None
 
-        action = self.agent.choose_action(state, possible_actions)
+        # Agent.choose_action, with the values of the state fetched at most once for both choices below.
+        agent = self.agent
+        values = None
+        if random.random() < agent.epsilon:
+            action = random.choice(possible_actions)
+        else:
+            # The draw action is only needed when a swap can be chosen.
+            swap = any(a[0] == 1 for a in possible_actions)
+            values = agent.action_values(
+                state, possible_actions + [draw_action] if swap else possible_actions
+            )
+            action = agent.best_action(possible_actions, values[: len(possible_actions)])
 
         # IF the agent chose to play a Swap, 8, or J, let them choose between playing it or drawing.
         if action[0] in [1]:
             possible_actions.append(draw_action)
-            action = self.agent.choose_action(state, possible_actions)
+            if random.random() < agent.epsilon:
+                action = random.choice(possible_actions)
+            else:
+                if values is None:
+                    values = agent.action_values(state, possible_actions)
+                action = agent.best_action(possible_actions, values)
 
         self.last_action = action
         if action == draw_action:
             return None
-        idx = -1
-        for i, card in enumerate(self.hand):
-            if card.number == action[0] and card.number in [1, 8]:
-                # print("Playing a J or 8")
-                # print(card)
-                if card.number == 8:
-                    # Set the correct suite
-                    card.suite = suite_map[action[1]]
-                # print(card)
-                # print(action[1])
-                idx = i
-                break
-            suite = card.suite.value if card.suite is not None else 0
-            if card.number == action[0] and suite == action[1]:
-                idx = i
-                break
-        return self.hand[idx]
-
+        return action_card(action)
 
-import os
-
-import pandas as pd
-import matplotlib.pyplot as plt
-
-# timing
-from time import perf_counter
 
 if __name__ == "__main__":
-    # epsilons = [0.025, 0.01]
-    # gammas = [0.95, 0.975, 0.99]
-    # alphas = [0.4, 0.5, 0.6]
-    # epsilons = [0.02, 0.015, 0.01]
-    # epsilons = [0.02, 0.01]
-    # gammas = [0.97, 0.98, 0.99]
-    file_prefix = "double_q_table_"
-    training = True
-    # epsilon_multiplier = 0.995
-    epsilon_multiplier = 0.999
-    gammas = [1]
-    epsilons = [0.04]
-    alphas = [0.35]
-
-    best_win_percent = 0
-    best_epsilon = None
-    best_gamma = None
-    best_alpha = None
-
-    df = pd.DataFrame(
-        columns=["games", "win_percent", "epsilon", "gamma", "alpha", "q_table_len"]
-    )
+    # The training script lives in train.py, so importing this module stays cheap.
+    import train
 
-    # profiling:
-    import cProfile
-    import pstats
-
-    profiling = False
-
-    if profiling:
-        pr = cProfile.Profile()
-        pr.enable()
-    t1 = perf_counter()
-
-    for original_epsilon in epsilons:
-        for gamma in gammas:
-            for alpha in alphas:
-                print(f"epsilon: {original_epsilon}, gamma: {gamma}, alpha: {alpha}")
-                try:
-                    if training:
-                        agent = DoubleQTableAgent(
-                            epsilon=original_epsilon,
-                            alpha=alpha,
-                            gamma=gamma,
-                            file_name=f"{file_prefix}_simple_strategy_{original_epsilon}e{gamma}g{alpha}a.bin",
-                        )
-                    else:
-                        agent = DoubleQTableAgent(
-                            epsilon=original_epsilon,
-                            alpha=alpha,
-                            gamma=gamma,
-                            file_name=f"{file_prefix}_simple_strategy_{original_epsilon}e{gamma}g{alpha}a.bin",
-                        )
-                except FileNotFoundError as e:
-                    print("Failed to load q table")
-                    agent = DoubleQTableAgent(
-                        epsilon=original_epsilon, alpha=alpha, gamma=gamma
-                    )
-                player1 = BetterAgentPlayer("Player 1", agent=agent)
-                # player1 = Player("Player 1")
-                # player1.agent = Agent()
-                # table_len = len(player1.agent.q_table)
-                if training:
-                    # player2 = RandomPlayer("Player 2", GOOD_RANDOM=False)
-                    # player2 = RandomPlayer("Player 2", GOOD_RANDOM=True)
-                    player2 = SimpleStrategyPlayer("Player 2")
-                else:
-                    player2 = Player("Player 2")
-                total_p1_wins = 0
-                total_p2_wins = 0
-                outer = 100
-                inner = 300
-                epsilon = original_epsilon if training else 0
-                for j in range(outer):
-                    epsilon = epsilon * epsilon_multiplier
-                    player1.agent.epsilon = epsilon
-                    if isinstance(agent, DoubleQTableAgent):
-                        table_len = len(player1.agent.q_table1) + len(
-                            player1.agent.q_table2
-                        )
-                    else:
-                        table_len = len(agent.q_table)
-                    p1_wins = 0
-                    p2_wins = 0
-                    for i in range(inner):
-                        game = Game(
-                            player1, player2, verbose=False if training else True
-                        )
-                        winner = game.start()
-                        if winner == 1:
-                            p1_wins += 1
-                        elif winner == 2:
-                            p2_wins += 1
-                    win_percent = p1_wins / (p1_wins + p2_wins)
-                    if isinstance(agent, DoubleQTableAgent):
-                        extra_in_table = (
-                            len(player1.agent.q_table1)
-                            + len(player1.agent.q_table2)
-                            - table_len
-                        )
-                    else:
-                        extra_in_table = len(agent.q_table) - table_len
-                    total_p1_wins += p1_wins
-                    total_p2_wins += p2_wins
-                    win_percent = total_p1_wins / (total_p1_wins + total_p2_wins)
-                    curr_win_percent = p1_wins / (p1_wins + p2_wins)
-                    df = df._append(
-                        {
-                            "games": (j + 1) * inner,
-                            "win_percent": win_percent,
-                            "epsilon": original_epsilon,
-                            "gamma": gamma,
-                            "alpha": alpha,
-                            "q_table_len": table_len + extra_in_table,
-                        },
-                        ignore_index=True,
-                    )
-                win_percent = total_p1_wins / (total_p1_wins + total_p2_wins)
-                if win_percent > best_win_percent:
-                    best_win_percent = win_percent
-                    best_epsilon = original_epsilon
-                    best_gamma = gamma
-                    best_alpha = alpha
-                print(
-                    f"Player 1 total win %: {total_p1_wins/(total_p1_wins + total_p2_wins)}"
-                )
-                print(f"epsilon: {original_epsilon}, gamma: {gamma}, alpha: {alpha}")
-                if training:
-                    print("Writing into file")
-                    print(f"{file_prefix}{original_epsilon}e{gamma}g{alpha}a.bin")
-                    agent.write_q_table(
-                        f"{file_prefix}_simple_strategy_{original_epsilon}e{gamma}g{alpha}a.bin"
-                    )
-                    print("Q table written into file")
-                    # print("Q table hits: ", player1.agent.q_table_hits)
-                    # print("Q table attempts: ", player1.agent.q_table_attempts)
-                    # print(
-                    #     "Q table hit %: ",
-                    #     player1.agent.q_table_hits / player1.agent.q_table_attempts,
-                    # )
-    print(
-        f"Best epsilon: {best_epsilon}, best gamma: {best_gamma}, best alpha: {best_alpha}"
-    )
-    print("Winning %: ", best_win_percent)
-
-    t2 = perf_counter()
-    print(f"Time taken: {t2 - t1}")
-
-    if profiling:
-        pr.disable()
-        ps = pstats.Stats(pr).sort_stats("cumulative")
-        # print into file
-        ps.print_stats()
-
-    # grouped_epsilons = df.groupby("epsilon")
-    grouped_data = df.groupby(["epsilon", "alpha", "gamma"])
-    plt.figure()
-    for key, group in grouped_data:
-        plt.plot(group["games"], group["win_percent"], label=key)
-    plt.xlabel("Games")
-    plt.ylabel("Win %")
-    plt.legend()
-    plt.grid(True)
-    plt.show()
-
-    # df.plot(x="games", y="win_percent")
-    # df.plot(x="games", y="q_table_len")
-    # plt.show()
-
-    # player1.write_q_table("q_table_mini_01e095g.bin")
-    # player1.write_q_table("q_table_2_1e975g4a_1.bin")
+    train.main()
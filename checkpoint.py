@@ -0,0 +1,238 @@
+"""
+Incremental checkpoints of the q tables of a training run.
+
+A checkpoint appends only the rows that were updated since the previous checkpoint to a delta log,
+so it takes time in proportion to the updates, not to the size of the tables.
+Every `snapshot_every` checkpoints the whole tables are written as a snapshot by a forked child process.
+The child gets a copy on write copy of the tables for free, so training goes on while it writes them.
+Without os.fork the snapshot is written in the training process.
+
+The files of the checkpoint <name>:
+    <name>.checkpoint           JSON with the generation of the newest complete snapshot and the progress
+                                at that snapshot, replaced atomically
+    <name>.<generation>_1, _2   a snapshot, written like DoubleQTableAgent.write_q_table
+    <name>.<generation>.delta   the rows updated after the snapshot of that generation,
+                                one pickled (progress, rows of table 1, rows of table 2) record per checkpoint
+
+The progress is a dict the training loop sets with played(), for example the games played and epsilon,
+so a resumed run continues where the checkpoint was taken.
+
+Resuming loads the newest complete snapshot and replays the delta logs of its generation and every
+later one, in order. A log that ends in a partly written record, from a crash during a checkpoint,
+is read up to that record. Once a snapshot is complete the child removes the snapshots and logs of
+the older generations.
+
+Generation 0 has no snapshot, so resuming it replays the delta logs on top of the tables the agent
+already holds, which have to be the tables the run started from (the same q table file).
+A Checkpointer whose agent starts with tables writes a snapshot of them right away, so only a crash
+before that snapshot is complete leaves a checkpoint at generation 0.
+"""
+
+import glob
+import json
+import os
+import pickle
+
+from q_table_file import load_q_table
+
+
+def agent_tables(agent) -> list:
+    """The tables of agent, dicts or the tables of a q_store.DenseQStore."""
+    if hasattr(agent, "store"):
+        return [agent.store.table(0), agent.store.table(1)]
+    if hasattr(agent, "q_table1"):
+        tables = [agent.q_table1, agent.q_table2]
+    else:
+        tables = [agent.q_table]
+    if not all(isinstance(table, dict) for table in tables):
+        raise ValueError("Checkpoints need dict q tables, not mapped ones")
+    return tables
+
+
+def read_manifest(name: str) -> tuple[int, dict]:
+    """
+    The generation of the newest complete snapshot of the checkpoint name and the progress at it,
+    (0, {}) if there is none.
+    """
+    try:
+        with open(f"{name}.checkpoint") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return 0, {}
+    return manifest["generation"], manifest["progress"]
+
+
+def read_generation(name: str) -> int:
+    return read_manifest(name)[0]
+
+
+def delta_generations(name: str) -> list[int]:
+    """The generations of the delta logs of the checkpoint name, in order."""
+    generations = []
+    for path in glob.glob(f"{glob.escape(name)}.*.delta"):
+        generation = path[len(name) + 1 : -len(".delta")]
+        if generation.isdigit():
+            generations.append(int(generation))
+    return sorted(generations)
+
+
+def read_deltas(path: str):
+    """The records of the delta log at path, up to the first one that is not complete."""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                return
+
+
+def exists(name: str) -> bool:
+    return os.path.exists(f"{name}.checkpoint") or bool(delta_generations(name))
+
+
+def resume(agent, name: str) -> tuple[int, dict]:
+    """
+    Loads the checkpoint name into the tables of agent. With a snapshot the snapshot replaces what
+    the tables held, without one the delta logs are replayed on top of them.
+    Returns the number of delta records that were replayed and the progress of the last checkpoint.
+    """
+    tables = agent_tables(agent)
+    generation, progress = read_manifest(name)
+    if generation > 0:
+        for i, table in enumerate(tables):
+            table.clear()
+            table.update(load_q_table(f"{name}.{generation}_{i + 1}"))
+    records = 0
+    for delta_generation in delta_generations(name):
+        if delta_generation < generation:
+            continue
+        for progress, *rows in read_deltas(f"{name}.{delta_generation}.delta"):
+            for table, table_rows in zip(tables, rows):
+                table.update(table_rows)
+            records += 1
+    return records, progress
+
+
+def remove(name: str) -> None:
+    """Removes every file of the checkpoint name."""
+    for path in glob.glob(f"{glob.escape(name)}.*"):
+        first = path[len(name) + 1 :].split(".")[0].split("_")[0]
+        if first == "checkpoint" or first.isdigit():
+            os.remove(path)
+
+
+class Checkpointer:
+    """
+    Checkpoints the tables of agent every `interval` games, see played().
+    If the checkpoint name already exists it is resumed into the agent first, and `progress` is
+    the progress of its last checkpoint.
+    Call close() at the end so the last games are in the checkpoint and the snapshot process has exited.
+    """
+
+    def __init__(self, agent, name: str, interval: int = 3000, snapshot_every: int = 10):
+        self.agent = agent
+        self.tables = agent_tables(agent)
+        self.name = name
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.games = 0
+        self.checkpoints = 0
+        self.child = None
+        self.progress = {}
+        resuming = exists(name)
+        if resuming:
+            records, self.progress = resume(agent, name)
+            print(f"Resumed {name} with {records} delta records at {self.progress}")
+        # A new log, so nothing is appended after a record a crash left half written.
+        self.generation = max([read_generation(name)] + delta_generations(name)) + 1
+        self.log = open(f"{name}.{self.generation}.delta", "ab")
+        agent.dirty = set()
+        if not resuming and any(self.tables):
+            # The deltas are only complete on top of the tables the run starts from.
+            self.snapshot()
+
+    def played(self, games: int, progress: dict | None = None) -> None:
+        """
+        Counts games played since the last call and checkpoints when an interval is over.
+        progress, when given, is stored with the checkpoints from now on. It has to describe the tables
+        as they are, so call this between iterations of the training loop.
+        """
+        if progress is not None:
+            self.progress = dict(progress)
+        before = self.games // self.interval
+        self.games += games
+        if self.games // self.interval > before:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Appends the rows updated since the last checkpoint to the delta log."""
+        dirty = self.agent.dirty
+        rows = tuple({} for _ in self.tables)
+        for table, state in dirty:
+            rows[table][state] = self.tables[table][state]
+        pickle.dump((self.progress,) + rows, self.log, protocol=pickle.HIGHEST_PROTOCOL)
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        dirty.clear()
+        self.checkpoints += 1
+        if self.checkpoints % self.snapshot_every == 0:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        """
+        Writes the whole tables as the snapshot of a new generation, in a child process when possible.
+        Skipped while the previous snapshot is still being written.
+        """
+        if self.child is not None:
+            pid, _ = os.waitpid(self.child, os.WNOHANG)
+            if pid == 0:
+                return
+            self.child = None
+        # Everything up to now is in the log of the current generation, later updates go to the next one.
+        self.log.close()
+        self.generation += 1
+        self.log = open(f"{self.name}.{self.generation}.delta", "ab")
+        if not hasattr(os, "fork"):
+            self.write_snapshot(self.generation)
+            return
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self.write_snapshot(self.generation)
+                code = 0
+            finally:
+                os._exit(code)
+        self.child = pid
+
+    def write_snapshot(self, generation: int) -> None:
+        for i, table in enumerate(self.tables):
+            path = f"{self.name}.{generation}_{i + 1}"
+            if not isinstance(table, dict):
+                table = table.to_dict()
+            with open(f"{path}.tmp", "wb") as f:
+                pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{path}.tmp", path)
+        with open(f"{self.name}.checkpoint.tmp", "w") as f:
+            json.dump({"generation": generation, "progress": self.progress}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{self.name}.checkpoint.tmp", f"{self.name}.checkpoint")
+        for old in range(generation):
+            for path in [f"{self.name}.{old}.delta"] + [
+                f"{self.name}.{old}_{i + 1}" for i in range(len(self.tables))
+            ]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self) -> None:
+        """Checkpoints the games since the last checkpoint and waits for the snapshot process."""
+        if self.agent.dirty:
+            self.checkpoint()
+        self.log.close()
+        if self.child is not None:
+            os.waitpid(self.child, 0)
+            self.child = None
+        self.agent.dirty = None
@@ -0,0 +1,294 @@
+"""
+A fast version of game.DiscordGame, cheap enough to play the Discord rules in training loops.
+
+Cards are small ints, their cell in the 13x5 hand grid (see rules.py): (value - 1) * 5 + suite,
+with suite 0 for swaps and 8s, which have NO_COLOR in the deck. The deck is a preallocated list
+that is refilled in place and drawn from the end with a cursor, and the hands are indexed by seat.
+
+The rules and the use of the random generator are the same as DiscordGame, so both games deal the
+same cards for the same seed:
+  - A new deck has every card of the values 2 to 13 except the 12, and the four swaps half of the time.
+  - The top card is redrawn until it is not a swap or an 8.
+  - Swap (1): swaps the hands, the top card stays.
+  - 8: keeps the value of the top card and changes its color.
+  - J (11): the next player is skipped.
+  - K (13): the other player draws one card.
+
+A play is an action as used by the agents: () to draw (or to end the turn after drawing),
+or (value, suite) for a card in the hand, where an 8 is played as (8, color) with the color it changes to.
+
+RandomPlayer, SimpleStrategyPlayer and AgentPlayer are the players of game.py for DeckGame. They go
+through the hand in the same order and use the random module the same way, so with the same seeds
+they play the same games as in DiscordGame. discord_simulation.py plays its games with them.
+"""
+
+import random
+
+import rules
+
+SWAP = rules.cell(1, 0)
+EIGHT = rules.cell(8, 0)
+
+# The decks in the order DiscordGame.reset_deck builds them, so a seeded shuffle gives the same order.
+DECK = tuple(
+    EIGHT if value == 8 else rules.cell(value, suite)
+    for value in range(2, 14)
+    if value != 12
+    for suite in range(1, 5)
+)
+DECK_WITH_SWAPS = (SWAP,) * 4 + DECK
+
+
+def card_str(card: int) -> str:
+    value, suite = divmod(card, 5)
+    name = {1: "Swap", 11: "J", 13: "K"}.get(value + 1, value + 1)
+    color = ["NO_COLOR", "RED", "BLUE", "GREEN", "YELLOW"][suite]
+    return f"{color:7} {name}"
+
+
+class DeckPlayer:
+    def __init__(self, name: str):
+        self.name = name
+
+    def get_play(
+        self,
+        hand: list[int],
+        actions: list[tuple],
+        top_card: int,
+        cards_in_enemy_hand: int,
+        has_drawn: bool,
+    ) -> tuple:
+        """
+        Picks one of `actions`, which always starts with () for drawing, or for ending the turn
+        when the player has already drawn.
+        """
+        raise NotImplementedError("This is an abstract class")
+
+
+def hand_grid(hand: list[int]) -> tuple:
+    """game.hand_grid for a hand of int cards."""
+    rows = [[0, 0, 0, 0, 0] for _ in range(13)]
+    for card in hand:
+        rows[card // 5][card % 5] += 1
+    return tuple(tuple(row) for row in rows)
+
+
+def card_action(card: int) -> tuple:
+    """The action that plays card, which is not an 8."""
+    return (card // 5 + 1, card % 5)
+
+
+class RandomPlayer(DeckPlayer):
+    """game.RandomPlayer for DeckGame."""
+
+    def __init__(self, name: str, GOOD_RANDOM: bool = True):
+        super().__init__(name)
+        self.GOOD_RANDOM = GOOD_RANDOM
+
+    def get_play(self, hand, actions, top_card, cards_in_enemy_hand, has_drawn):
+        playable = rules.PLAYABLE[top_card]
+        options = [card for card in hand if playable[card]]
+        if not self.GOOD_RANDOM:
+            options.append(None)
+        if not options:
+            return ()
+        play = random.choice(options)
+        if play is None:
+            return ()
+        if play == EIGHT:
+            return (8, random.randint(0, 3) + 1)
+        return card_action(play)
+
+
+class SimpleStrategyPlayer(DeckPlayer):
+    """game.SimpleStrategyPlayer for DeckGame."""
+
+    def get_play(self, hand, actions, top_card, cards_in_enemy_hand, has_drawn):
+        playable = rules.PLAYABLE[top_card]
+        cards = [card for card in hand if playable[card]]
+        if not cards:
+            return ()
+        top_suite = top_card % 5
+        # First try to play the king of the same suite.
+        other_suite_king = None
+        same_suite = None
+        other_suite = None
+        suite_counts = [0 for _ in range(5)]
+        for card in cards:
+            value, suite = divmod(card, 5)
+            if value == 12:
+                if suite == top_suite:
+                    return card_action(card)
+                other_suite_king = card
+            if value not in [0, 7, 10]:
+                if suite == top_suite:
+                    same_suite = card
+                else:
+                    other_suite = card
+            suite_counts[suite] += 1
+        if other_suite_king is not None:
+            return card_action(other_suite_king)
+        if same_suite is not None:
+            return card_action(same_suite)
+        if other_suite is not None:
+            return card_action(other_suite)
+        # If there are no normal cards of the same suite, play a 8 and swap to the suite with the most cards.
+        if EIGHT in cards:
+            return (8, suite_counts.index(max(suite_counts)))
+        # Otherwise, play a random card.
+        return card_action(random.choice(cards))
+
+
+class AgentPlayer(DeckPlayer):
+    """
+    game.AgentPlayer for DeckGame, which plays with a q table agent from blazing8s.py without learning.
+    Whether the enemy played a card is guessed the same way. Use a new AgentPlayer for every game.
+    """
+
+    def __init__(self, name: str, agent):
+        super().__init__(name)
+        self.agent = agent
+        self.last_top = None
+        self.enemy_played = False
+
+    def get_play(self, hand, actions, top_card, cards_in_enemy_hand, has_drawn):
+        top = card_action(top_card)
+        if not has_drawn:
+            self.enemy_played = self.last_top is not None and top != self.last_top
+        state = (
+            cards_in_enemy_hand,
+            top,
+            len(hand),
+            hand_grid(hand),
+            has_drawn,
+            self.enemy_played,
+        )
+        possible_actions = actions[1:]
+        self.last_top = top
+        if not possible_actions:
+            return ()
+        action = self.agent.choose_action(state, possible_actions)
+        # If the agent chose to play a swap, let it choose between playing it or drawing.
+        if action[0] == 1:
+            action = self.agent.choose_action(state, possible_actions + [()])
+        if action == ():
+            return ()
+        if action[0] == 1:
+            # The top card stays.
+            return action
+        if action[0] == 8:
+            self.last_top = (top[0], action[1])
+        else:
+            self.last_top = action
+        return action
+
+
+class DeckGame:
+    def __init__(self, player1: DeckPlayer, player2: DeckPlayer, seed: int | None = None):
+        """
+        A game with a seed has its own generator for the deck and for who starts,
+        so the same seed deals the same game as DiscordGame. Without one the global random module is used.
+        """
+        self.players = (player1, player2)
+        self.rng = random if seed is None else random.Random(seed)
+        self.decks = (list(DECK), list(DECK_WITH_SWAPS))
+        self.deck = self.decks[0]
+        self.cursor = 0
+        self.hands = ([], [])
+        self.turns = 0
+        self.deal()
+        self.top_card = self.draw()
+        while self.top_card == SWAP or self.top_card == EIGHT:
+            # Put it back and shuffle the rest of the deck with it.
+            self.deck[self.cursor] = self.top_card
+            self.cursor += 1
+            rest = self.deck[: self.cursor]
+            self.rng.shuffle(rest)
+            self.deck[: self.cursor] = rest
+            self.top_card = self.draw()
+        self.seat = 0 if self.rng.randint(0, 1) == 0 else 1
+        self.skip_next_player = False
+
+    def reset_deck(self) -> None:
+        # Only 50% chance of getting swap cards
+        with_swaps = self.rng.randint(0, 1) != 0
+        self.deck = self.decks[with_swaps]
+        self.deck[:] = DECK_WITH_SWAPS if with_swaps else DECK
+        self.rng.shuffle(self.deck)
+        self.cursor = len(self.deck)
+
+    def draw(self) -> int:
+        if self.cursor == 0:
+            self.reset_deck()
+        self.cursor -= 1
+        return self.deck[self.cursor]
+
+    def deal(self) -> None:
+        self.reset_deck()
+        for _ in range(5):
+            self.hands[0].append(self.draw())
+            self.hands[1].append(self.draw())
+
+    def actions(self, seat: int) -> list[tuple]:
+        cells = 0
+        for card in self.hands[seat]:
+            cells |= 1 << card
+        return [()] + rules.playable_actions(cells, self.top_card)
+
+    def play_card(self, seat: int, action: tuple) -> bool:
+        value, suite = action
+        card = rules.cell(value, 0 if value == 1 or value == 8 else suite)
+        hand = self.hands[seat]
+        if card not in hand or not rules.PLAYABLE[self.top_card][card]:
+            return False
+        # Like DiscordGame, an 8 can change the color to NO_COLOR (suite 0), as SimpleStrategyPlayer does.
+        hand.remove(card)
+        self.skip_next_player = False
+        if value == 1:
+            # Swap hands
+            self.hands = (self.hands[1], self.hands[0])
+            return True
+        if value == 8:
+            self.top_card = self.top_card - self.top_card % 5 + suite
+            return True
+        if value == 11:
+            # Need to skip the next player
+            self.skip_next_player = True
+        if value == 13:
+            # Make the other player draw 1 card
+            self.hands[1 - seat].append(self.draw())
+        self.top_card = card
+        return True
+
+    def loop(self) -> DeckPlayer:
+        while True:
+            if len(self.hands[0]) == 0:
+                return self.players[0]
+            if len(self.hands[1]) == 0:
+                return self.players[1]
+            if self.skip_next_player:
+                self.skip_next_player = False
+                self.seat = 1 - self.seat
+
+            self.turns += 1
+            seat = self.seat
+            has_drawn = False
+            while True:
+                play = self.players[seat].get_play(
+                    self.hands[seat],
+                    self.actions(seat),
+                    self.top_card,
+                    len(self.hands[1 - seat]),
+                    has_drawn,
+                )
+                if play == ():
+                    if has_drawn:
+                        break
+                    self.hands[seat].append(self.draw())
+                    has_drawn = True
+                else:
+                    if not self.play_card(seat, play):
+                        raise Exception("Invalid play")
+                    break
+
+            self.seat = 1 - seat
@@ -0,0 +1,186 @@
+"""
+Plays many headless games of the Discord rules in several processes
+and prints the win and turn statistics as the results come in.
+The games are played in deck_game.DeckGame with the players of deck_game.py, which play the same games
+as game.DiscordGame and its players for the same seeds, a few times faster.
+
+With --compare the same policies also play the same number of games, with the same seeds,
+in the engine with i.i.d. draws (blazing8s.Game), and the win rates of both engines are compared.
+The agent does not learn in either engine.
+
+Run with, for example:
+    python discord_simulation.py --games 1000000 --player1 agent --agent-file <file_name> --player2 simple --compare
+where <file_name> is the path of a DoubleQTableAgent table, as written by DoubleQTableAgent.write_q_table:
+the files <file_name>_1 and <file_name>_2 (or <file_name>_1.qt and <file_name>_2.qt), relative to the
+current directory. Unlike Agent tables, they are not looked up in q_tables/.
+"""
+
+import argparse
+import math
+import multiprocessing
+import random
+
+import blazing8s
+import deck_game
+from blazing8s import DoubleQTableAgent, Game
+from deck_game import DeckGame
+
+PLAYERS = ["random", "bad_random", "simple", "agent"]
+ENGINES = ["discord", "iid"]
+
+# Set in every worker by _init_worker.
+_agent = None
+
+
+class FrozenAgentPlayer(blazing8s.BetterAgentPlayer):
+    """BetterAgentPlayer that does not update its q tables."""
+
+    def update_reward(self, top, enemy_hand_length, drew, last_player_played) -> None:
+        pass
+
+
+def _init_worker(agent: DoubleQTableAgent | None) -> None:
+    global _agent
+    _agent = agent
+
+
+def make_player(engine: str, kind: str, name: str):
+    if engine == "discord":
+        if kind == "random":
+            return deck_game.RandomPlayer(name)
+        if kind == "bad_random":
+            return deck_game.RandomPlayer(name, GOOD_RANDOM=False)
+        if kind == "simple":
+            return deck_game.SimpleStrategyPlayer(name)
+        return deck_game.AgentPlayer(name, _agent)
+    if kind == "random":
+        return blazing8s.RandomPlayer(name)
+    if kind == "bad_random":
+        return blazing8s.RandomPlayer(name, GOOD_RANDOM=False)
+    if kind == "simple":
+        return blazing8s.SimpleStrategyPlayer(name)
+    return FrozenAgentPlayer(name, agent=_agent)
+
+
+def play_chunk(task: tuple) -> tuple:
+    """
+    Plays `games` games with the seeds first_seed, first_seed + 1, ...
+    Returns (engine, games, player 1 wins, player 2 wins, sum of turns, sum of squared turns).
+    """
+    engine, kind1, kind2, first_seed, games = task
+    random.seed(first_seed)
+    p1_wins = 0
+    p2_wins = 0
+    turns = 0
+    turns_squared = 0
+    for seed in range(first_seed, first_seed + games):
+        player1 = make_player(engine, kind1, "Player 1")
+        player2 = make_player(engine, kind2, "Player 2")
+        if engine == "discord":
+            discord_game = DeckGame(player1, player2, seed)
+            winner = 1 if discord_game.loop() is player1 else 2
+            game_turns = discord_game.turns
+        else:
+            iid_game = Game(player1, player2, seed=seed)
+            winner = iid_game.start()
+            game_turns = iid_game.turns
+        if winner == 1:
+            p1_wins += 1
+        elif winner == 2:
+            p2_wins += 1
+        turns += game_turns
+        turns_squared += game_turns * game_turns
+    return engine, games, p1_wins, p2_wins, turns, turns_squared
+
+
+class Stats:
+    def __init__(self):
+        self.games = 0
+        self.p1_wins = 0
+        self.p2_wins = 0
+        self.turns = 0
+        self.turns_squared = 0
+
+    def add(self, games: int, p1_wins: int, p2_wins: int, turns: int, turns_squared: int):
+        self.games += games
+        self.p1_wins += p1_wins
+        self.p2_wins += p2_wins
+        self.turns += turns
+        self.turns_squared += turns_squared
+
+    def win_rate(self) -> float:
+        return self.p1_wins / self.games
+
+    def win_rate_error(self) -> float:
+        """Half width of the 95% confidence interval of the win rate of player 1."""
+        p = self.win_rate()
+        return 1.96 * math.sqrt(p * (1 - p) / self.games)
+
+    def mean_turns(self) -> float:
+        return self.turns / self.games
+
+    def turns_deviation(self) -> float:
+        mean = self.mean_turns()
+        return math.sqrt(max(self.turns_squared / self.games - mean * mean, 0))
+
+    def __str__(self):
+        draws = self.games - self.p1_wins - self.p2_wins
+        return (
+            f"{self.games:9} games  player 1: {self.win_rate() * 100:6.2f}% "
+            f"± {self.win_rate_error() * 100:.2f}  player 2: {self.p2_wins / self.games * 100:6.2f}%"
+            f"  draws: {draws}  turns: {self.mean_turns():.1f} ± {self.turns_deviation():.1f}"
+        )
+
+
+def tasks(engines: list[str], kind1: str, kind2: str, games: int, chunk: int, seed: int):
+    for start in range(0, games, chunk):
+        for engine in engines:
+            yield engine, kind1, kind2, seed + start, min(chunk, games - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--player1", choices=PLAYERS, default="simple")
+    parser.add_argument("--player2", choices=PLAYERS, default="random")
+    parser.add_argument("--agent-file", default=None)
+    parser.add_argument("--mapped", action="store_true", help="Map the .qt files of the agent")
+    parser.add_argument("--epsilon", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+
+    agent = None
+    if "agent" in [args.player1, args.player2]:
+        if args.agent_file is None:
+            parser.error("--agent-file is needed for the agent player")
+        # Loaded once here, the workers get a copy of it.
+        agent = DoubleQTableAgent(
+            epsilon=args.epsilon, file_name=args.agent_file, mapped=args.mapped
+        )
+
+    engines = ENGINES if args.compare else ["discord"]
+    stats = {engine: Stats() for engine in engines}
+    with multiprocessing.Pool(args.workers, _init_worker, (agent,)) as pool:
+        for engine, *result in pool.imap_unordered(
+            play_chunk,
+            tasks(engines, args.player1, args.player2, args.games, args.chunk, args.seed),
+        ):
+            stats[engine].add(*result)
+            print(f"{engine:8} {stats[engine]}", flush=True)
+
+    print()
+    print(f"{args.player1} (player 1) vs {args.player2} (player 2)")
+    for engine in engines:
+        print(f"{engine:8} {stats[engine]}")
+    if args.compare:
+        discord = stats["discord"]
+        iid = stats["iid"]
+        difference = discord.win_rate() - iid.win_rate()
+        error = math.sqrt(discord.win_rate_error() ** 2 + iid.win_rate_error() ** 2)
+        print(
+            f"The win rate of player 1 is {difference * 100:+.2f}% ± {error * 100:.2f}"
+            " with the Discord rules"
+        )
@@ -7,6 +7,8 @@ import random
 from enum import Enum
 from typing import Self
 
+import rules
+
 
 class Suite(Enum):
     RED = 1
@@ -32,9 +34,30 @@ class Suite(Enum):
 
 
 class Card:
-    def __init__(self, value: int, suite: Suite | None):
-        self.value = value
-        self.suite = suite
+    """
+    Cards are immutable and interned: Card(value, suite) returns the same object every time,
+    so building a new deck does not allocate.
+    Swaps and 8s are NO_COLOR in the deck. An 8 is played as Card(8, color) with the color it changes to,
+    see held_card.
+    """
+
+    __slots__ = ("value", "suite")
+    interned = {}
+
+    def __new__(cls, value: int, suite: Suite | None):
+        card = Card.interned.get((value, suite))
+        if card is None:
+            card = super().__new__(cls)
+            object.__setattr__(card, "value", value)
+            object.__setattr__(card, "suite", suite)
+            Card.interned[(value, suite)] = card
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards are immutable, use Card(value, suite) for another card")
+
+    def __reduce__(self):
+        return Card, (self.value, self.suite)
 
     def __str__(self):
         # color = {1: "Red", 2: "Blue", 3: "Green", 4: "Yellow"}
@@ -42,6 +65,20 @@ class Card:
         return f"{self.suite.name if self.suite is not None else 'None':7} {number[self.value] if self.value in number else self.value}"
 
 
+def held_card(card: Card) -> Card:
+    """The card in the hand that is played as card, which is the card itself except for colored swaps and 8s."""
+    if card.value == 1 or card.value == 8:
+        return Card(card.value, Suite.NO_COLOR)
+    return card
+
+
+def card_cell(card: Card) -> int:
+    """The cell of card in the hand grid, see rules.py. Swaps, 8s and NO_COLOR cards are in column 0."""
+    if card.value == 1 or card.value == 8 or card.suite in (None, Suite.NO_COLOR):
+        return rules.cell(card.value, 0)
+    return rules.cell(card.value, card.suite.value)
+
+
 class Skip:
     def __init__(self):
         pass
@@ -93,9 +130,14 @@ class Player:
 class DiscordGame:
     TWO_PLAYER = True
 
-    def __init__(self, player1: Player, player2: Player):
+    def __init__(self, player1: Player, player2: Player, seed: int | None = None):
+        """
+        A game with a seed has its own generator for the deck and for who starts,
+        so the same seed deals the same game. Without one the global random module is used.
+        """
         self.player1 = player1
         self.player2 = player2
+        self.rng = random if seed is None else random.Random(seed)
         self.player1_hand = []
         self.player2_hand = []
         self.deck = []
@@ -103,12 +145,13 @@ class DiscordGame:
         self.top_card = self.draw()
         while self.top_card.suite == Suite.NO_COLOR:
             self.deck.append(self.top_card)
-            random.shuffle(self.deck)
+            self.rng.shuffle(self.deck)
             self.top_card = self.draw()
         self.current_player = (
-            self.player1 if random.randint(0, 1) == 0 else self.player2
+            self.player1 if self.rng.randint(0, 1) == 0 else self.player2
         )
         self.skip_next_player = False
+        self.turns = 0
 
     def reset_deck(self):
         self.deck = []
@@ -117,7 +160,7 @@ class DiscordGame:
                 continue
             if i == 1:
                 # Only 50% chance of getting a swap card
-                if random.randint(0, 1) == 0:
+                if self.rng.randint(0, 1) == 0:
                     continue
             for j in range(4):
                 if i == 1 or i == 8:
@@ -126,7 +169,7 @@ class DiscordGame:
                     suite = Suite.from_int(j)
                     self.deck.append(Card(i, suite))
 
-        random.shuffle(self.deck)
+        self.rng.shuffle(self.deck)
 
     def draw(self):
         if len(self.deck) == 0:
@@ -153,21 +196,13 @@ class DiscordGame:
             return None
 
     def get_playable_cards(self, player) -> list[Card | Skip | Draw]:
-        playable_cards = []
-        for card in self.get_player_hand(player):
-            if (
-                card.suite == self.top_card.suite
-                or card.value == self.top_card.value
-                or card.value == 1
-                or card.value == 8
-            ):
-                playable_cards.append(card)
-        return playable_cards
+        playable = rules.PLAYABLE[card_cell(self.top_card)]
+        return [card for card in self.get_player_hand(player) if playable[card_cell(card)]]
 
     def play_card(self, player, card: Card):
-        if card not in self.get_playable_cards(player):
+        if held_card(card) not in self.get_playable_cards(player):
             return False
-        self.get_player_hand(player).remove(card)
+        self.get_player_hand(player).remove(held_card(card))
         self.skip_next_player = False
         if card.value == 1:
             # Swap hands
@@ -176,7 +211,7 @@ class DiscordGame:
         if card.value == 8:
             if card.suite == None:
                 return False  # Should set the suite before playing the card
-            self.top_card.suite = card.suite
+            self.top_card = Card(self.top_card.value, card.suite)
             return True
         if card.value == 11:
             # Need to skip the next player
@@ -208,6 +243,7 @@ class DiscordGame:
                     else self.player2
                 )
 
+            self.turns += 1
             has_drawn = False
             while True:
                 playable_cards = self.get_playable_cards(self.current_player)
@@ -300,17 +336,137 @@ class TUIPlayer(Player):
                     choice = int(input(f"Enter the suite you want to set: \n{suites}"))
                     if choice < 1 or choice > 4:
                         raise Exception("Invalid choice")
-                    play.suite = Suite.from_int(choice - 1)
+                    play = Card(8, Suite.from_int(choice - 1))
                     break
                 except Exception as e:
                     print(e)
         return play
 
 
+def hand_grid(hand: list[Card]) -> tuple:
+    """The 13x5 card count grid of a hand, the hand part of the blazing8s agent state."""
+    rows = [[0, 0, 0, 0, 0] for _ in range(13)]
+    for card in hand:
+        cell = card_cell(card)
+        rows[cell // 5][cell % 5] += 1
+    return tuple(tuple(row) for row in rows)
+
+
+def pass_turn(playable_cards: list[Card | Skip | Draw]) -> Draw | Skip:
+    """The Draw or Skip at the end of playable_cards."""
+    return playable_cards[-1]
+
+
+class RandomPlayer(Player):
+    """
+    blazing8s.RandomPlayer for DiscordGame: plays a random playable card with a random color for 8s.
+    With GOOD_RANDOM it only draws or skips when it has nothing to play, otherwise that is one of the options.
+    """
+
+    def __init__(self, name, GOOD_RANDOM: bool = True):
+        super().__init__(name)
+        self.GOOD_RANDOM = GOOD_RANDOM
+
+    def get_play(self, hand, playable_cards, top_card, cards_in_enemy_hand):
+        options = [c for c in playable_cards if isinstance(c, Card)]
+        if not self.GOOD_RANDOM:
+            options.append(pass_turn(playable_cards))
+        if not options:
+            return pass_turn(playable_cards)
+        play = random.choice(options)
+        if isinstance(play, Card) and play.value == 8:
+            play = Card(8, Suite.from_int(random.randint(0, 3)))
+        return play
+
+
+class SimpleStrategyPlayer(Player):
+    """blazing8s.SimpleStrategyPlayer for DiscordGame."""
+
+    def get_play(self, hand, playable_cards, top_card, cards_in_enemy_hand):
+        cards = [c for c in playable_cards if isinstance(c, Card)]
+        if not cards:
+            return pass_turn(playable_cards)
+        # First try to play the king of the same suite.
+        other_suite_king = None
+        same_suite = None
+        other_suite = None
+        suite_counts = [0 for _ in range(5)]
+        for card in cards:
+            if card.value == 13:
+                if card.suite == top_card.suite:
+                    return card
+                other_suite_king = card
+            if card.value not in [1, 8, 11]:
+                if card.suite == top_card.suite:
+                    same_suite = card
+                else:
+                    other_suite = card
+            suite_counts[card_cell(card) % 5] += 1
+        if other_suite_king is not None:
+            return other_suite_king
+        if same_suite is not None:
+            return same_suite
+        if other_suite is not None:
+            return other_suite
+        # If there are no normal cards of the same suite, play a 8 and swap to the suite with the most cards.
+        for card in cards:
+            if card.value == 8:
+                max_idx = suite_counts.index(max(suite_counts))
+                return Card(8, Suite.NO_COLOR if max_idx == 0 else Suite(max_idx))
+        # Otherwise, play a random card.
+        return random.choice(cards)
+
+
 class AgentPlayer(Player):
-    def __init__(self, name):
+    """
+    Plays with a q table agent from blazing8s.py the way blazing8s.BetterAgentPlayer does, without learning.
+    DiscordGame does not tell the players whether the enemy played a card on their last turn, so that part
+    of the state is taken to be whether the top card changed since this player's last play.
+    It is wrong when the enemy played a swap, or a copy of the top card from an earlier deck.
+    Use a new AgentPlayer for every game.
+    """
+
+    def __init__(self, name, agent):
         super().__init__(name)
-        # TODO: Add agent from blazing8s.py
+        self.agent = agent
+        self.last_top = None
+        self.enemy_played = False
+
+    def get_play(self, hand, playable_cards, top_card, cards_in_enemy_hand):
+        drew = isinstance(pass_turn(playable_cards), Skip)
+        top_cell = card_cell(top_card)
+        top = (top_card.value, top_cell % 5)
+        if not drew:
+            self.enemy_played = self.last_top is not None and top != self.last_top
+        state = (
+            cards_in_enemy_hand,
+            top,
+            len(hand),
+            hand_grid(hand),
+            drew,
+            self.enemy_played,
+        )
+        cells = 0
+        for card in hand:
+            cells |= 1 << card_cell(card)
+        possible_actions = rules.playable_actions(cells, top_cell)
+        self.last_top = top
+        if not possible_actions:
+            return pass_turn(playable_cards)
+        action = self.agent.choose_action(state, possible_actions)
+        # If the agent chose to play a swap, let it choose between playing it or drawing.
+        if action[0] == 1:
+            action = self.agent.choose_action(state, possible_actions + [()])
+        if action == ():
+            return pass_turn(playable_cards)
+        number, suite = action
+        if number == 1:
+            return Card(1, Suite.NO_COLOR)
+        if number == 8:
+            self.last_top = (top_card.value, suite)
+        else:
+            self.last_top = action
+        return Card(number, Suite(suite))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""
+Lightweight instrumentation for training runs.
+
+Instrumentation wraps the hot methods of a game, its players and an agent with timers and counters.
+The wrappers are set on the instances, so objects that are not attached run the plain methods
+and pay nothing when instrumentation is off.
+
+The timers are exclusive: time spent in a nested instrumented call is only counted for the inner
+phase, so the phases add up to the total instrumented time. The phases are:
+    decision:         the player picking a card, outside the agent
+    canonicalization: sorting the suites of a state and packing it into a q table key
+    q_lookup:         reading q values and picking the best action
+    td_update:        the q learning update, outside the reward
+    reward:           Agent.reward and Agent.feature_reward
+    bookkeeping:      the game itself, dealing, drawing and applying card effects
+
+flush() returns the timers and counters gathered since the last flush as a flat dict
+and starts over, so it can be called once per `outer` iteration of the training loop.
+"""
+
+from collections import Counter
+from time import perf_counter
+
+PHASES = [
+    "decision",
+    "canonicalization",
+    "q_lookup",
+    "td_update",
+    "reward",
+    "bookkeeping",
+]
+
+
+class Instrumentation:
+    def __init__(self):
+        self.timers = dict.fromkeys(PHASES, 0.0)
+        self.counters = Counter()
+        # Time spent in nested instrumented calls, one entry per call in progress.
+        self.stack = []
+        self.agents = []
+        self.table_sizes = {}
+
+    def timed(self, fn, phase: str, counter: str | None = None):
+        timers = self.timers
+        stack = self.stack
+        counters = self.counters
+
+        def wrapper(*args, **kwargs):
+            if counter is not None:
+                counters[counter] += 1
+            stack.append(0.0)
+            t1 = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - t1
+                timers[phase] += elapsed - stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+
+        return wrapper
+
+    def wrap(self, obj, name: str, phase: str, counter: str | None = None) -> None:
+        if hasattr(obj, name):
+            setattr(obj, name, self.timed(getattr(obj, name), phase, counter))
+
+    def counted(self, obj, name: str, counter: str) -> None:
+        fn = getattr(obj, name)
+        counters = self.counters
+
+        def wrapper(*args, **kwargs):
+            counters[counter] += 1
+            return fn(*args, **kwargs)
+
+        setattr(obj, name, wrapper)
+
+    def attach_game(self, game) -> None:
+        self.counters["games_played"] += 1
+        self.wrap(game, "start", "bookkeeping")
+        self.wrap(game, "turn", "bookkeeping", "turns")
+        self.wrap(game, "apply_card_effect", "bookkeeping")
+
+    def attach_player(self, player) -> None:
+        self.wrap(player, "choose_card", "decision", "decisions")
+        # Every card that goes into the hand: the deal, draw decisions and the cards a king forces on the player.
+        self.counted(player, "draw", "cards_drawn")
+        self.wrap(player, "update_reward", "td_update", "updates")
+
+    def attach_agent(self, agent) -> None:
+        self.wrap(agent, "canonical_key", "canonicalization")
+        self.wrap(agent, "get_q_value", "q_lookup")
+        self.wrap(agent, "choose_action", "q_lookup")
+        self.wrap(agent, "action_values", "q_lookup")
+        self.wrap(agent, "update_q_value", "td_update")
+        self.wrap(agent, "reward", "reward")
+        self.wrap(agent, "feature_reward", "reward")
+        self.agents.append(agent)
+        self.table_sizes[id(agent)] = (
+            table_size(agent),
+            agent.q_table_hits,
+            agent.q_table_attempts,
+        )
+
+    def flush(self, **fields) -> dict:
+        """
+        The timers and counters since the last flush, together with `fields`.
+        The fields come last, so a field with the name of a counter is kept as it is.
+        """
+        record = {}
+        for phase in PHASES:
+            record[f"{phase}_seconds"] = self.timers[phase]
+        record.update(self.counters)
+        for agent in self.agents:
+            size, hits, attempts = self.table_sizes[id(agent)]
+            record["new_states"] = record.get("new_states", 0) + table_size(agent) - size
+            record["q_table_hits"] = record.get("q_table_hits", 0) + agent.q_table_hits - hits
+            record["q_table_attempts"] = (
+                record.get("q_table_attempts", 0) + agent.q_table_attempts - attempts
+            )
+            self.table_sizes[id(agent)] = (
+                table_size(agent),
+                agent.q_table_hits,
+                agent.q_table_attempts,
+            )
+        record.update(fields)
+        self.timers.update(dict.fromkeys(PHASES, 0.0))
+        self.counters.clear()
+        return record
+
+
+def table_size(agent) -> int:
+    if hasattr(agent, "store"):
+        return len(agent.store)
+    if hasattr(agent, "q_table1"):
+        return len(agent.q_table1) + len(agent.q_table2)
+    return len(agent.q_table)
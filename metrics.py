@@ -0,0 +1,114 @@
+"""
+Streaming training metrics.
+
+MetricsWriter appends one row per outer iteration of the training loop to a CSV or JSON lines file,
+chosen by the extension of the path, and flushes it right away. A row costs the same no matter how
+long the run is, nothing is kept in memory, and the rows written before a crash stay in the file.
+A new MetricsWriter replaces the file of an earlier run. A run that resumed from a checkpoint passes
+the games of the checkpoint as resume_at, which keeps the rows up to it and appends after them,
+so the rows of games that are played again are not in the file twice.
+
+The plots are rendered offline, without a display:
+    python metrics.py plot <metrics file> <png file>
+which plots the win % of every (epsilon, alpha, gamma) configuration against the games played.
+"""
+
+import csv
+import json
+import os
+import sys
+
+COLUMNS = [
+    "games",
+    "win_percent",
+    "epsilon",
+    "gamma",
+    "alpha",
+    "q_table_len",
+    "seconds",
+    "total_seconds",
+]
+
+
+class MetricsWriter:
+    def __init__(self, path: str, columns: list[str] = COLUMNS, resume_at: int | None = None):
+        self.path = path
+        self.jsonl = path.endswith(".jsonl")
+        rows = []
+        if resume_at is not None and os.path.exists(path):
+            rows = [row for row in read_rows(path) if float(row["games"]) <= resume_at]
+        self.file = open(path, "w", newline="")
+        self.csv = None
+        if not self.jsonl:
+            self.csv = csv.DictWriter(self.file, columns, extrasaction="ignore")
+            self.csv.writeheader()
+        for row in rows:
+            self.write(row)
+
+    def write(self, row: dict) -> None:
+        if self.jsonl:
+            self.file.write(json.dumps(row) + "\n")
+        else:
+            self.csv.writerow(row)
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_rows(path: str):
+    """The rows of a metrics file, one at a time, with the values of CSV files left as strings."""
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        yield from csv.DictReader(f)
+
+
+def read_metrics(path: str):
+    """The rows of a metrics file, one at a time, with the numbers of CSV files parsed."""
+    for row in read_rows(path):
+        if path.endswith(".jsonl"):
+            yield row
+        else:
+            yield {k: float(v) if v else None for k, v in row.items()}
+
+
+def plot(path: str, output: str) -> None:
+    """Plots the win % against the games of every (epsilon, alpha, gamma) configuration into output."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    curves = {}
+    for row in read_metrics(path):
+        key = (row["epsilon"], row["alpha"], row["gamma"])
+        if key not in curves:
+            curves[key] = ([], [])
+        curves[key][0].append(row["games"])
+        curves[key][1].append(row["win_percent"])
+    fig = plt.figure()
+    for (epsilon, alpha, gamma), (games, win_percent) in curves.items():
+        plt.plot(games, win_percent, label=f"epsilon {epsilon}, alpha {alpha}, gamma {gamma}")
+    plt.xlabel("Games")
+    plt.ylabel("Win %")
+    plt.legend()
+    plt.grid(True)
+    fig.savefig(output)
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "plot":
+        print("Usage: python metrics.py plot <metrics file> <png file>")
+        sys.exit(1)
+    plot(sys.argv[2], sys.argv[3])
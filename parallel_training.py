@@ -0,0 +1,161 @@
+"""
+Parallel self-play training for DoubleQTableAgent.
+Each worker process owns a copy of the agent's q tables and plays games against
+SimpleStrategyPlayer. Every `sync_interval` games the workers send the updates
+they made back to the master, which merges them into its q_table1/q_table2 and
+sends the merged values back out so every worker continues from the same tables.
+
+Two ways of merging are supported:
+  - "average": every changed entry is set to the visit-weighted average of the
+    worker values, so a worker that updated an entry 10 times counts 10 times
+    as much as a worker that updated it once.
+  - "replay": the changes of all workers are added on top of each other, as if
+    they had been applied one after another in a single process.
+"""
+
+import multiprocessing
+import random
+
+from blazing8s import (
+    BetterAgentPlayer,
+    DoubleQTableAgent,
+    Game,
+    SimpleStrategyPlayer,
+    card_stream,
+)
+
+MERGE_MODES = ["average", "replay"]
+
+
+def _worker(connection, agent: DoubleQTableAgent, seed: int | None) -> None:
+    random.seed(seed)
+    card_stream.seed(seed)
+    tables = (agent.q_table1, agent.q_table2)
+    # The master checkpoints the merged updates, see ParallelTrainer.merge_changes.
+    agent.dirty = None
+    player1 = BetterAgentPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        epsilon, games, merged = message
+        for (table, state, action), value in merged.items():
+            if state not in tables[table]:
+                tables[table][state] = {}
+            tables[table][state][action] = value
+        agent.epsilon = epsilon
+        agent.changes = {}
+        p1_wins = 0
+        p2_wins = 0
+        for _ in range(games):
+            winner = Game(player1, player2).start()
+            if winner == 1:
+                p1_wins += 1
+            elif winner == 2:
+                p2_wins += 1
+        connection.send((p1_wins, p2_wins, agent.changes))
+        agent.changes = None
+    connection.close()
+
+
+class ParallelTrainer:
+    """
+    Trains `agent` with `workers` processes.
+    Use it as a context manager or call close() when done so the workers exit.
+    """
+
+    def __init__(
+        self,
+        agent: DoubleQTableAgent,
+        workers: int | None = None,
+        sync_interval: int = 50,
+        merge: str = "average",
+        seed: int | None = None,
+    ):
+        if merge not in MERGE_MODES:
+            raise ValueError(f"merge must be one of {MERGE_MODES}, got {merge}")
+        self.agent = agent
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.sync_interval = sync_interval
+        self.merge = merge
+        self.connections = []
+        self.processes = []
+        # The workers start from a copy of the agent's current tables.
+        # With the fork start method that copy is free.
+        for i in range(self.workers):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(child, agent, None if seed is None else seed + i),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.merged = {}
+
+    def play(self, games: int) -> tuple[int, int]:
+        """Plays `games` games spread over the workers. Returns (p1_wins, p2_wins)."""
+        p1_wins = 0
+        p2_wins = 0
+        remaining = games
+        while remaining > 0:
+            counts = []
+            for connection in self.connections:
+                count = min(self.sync_interval, remaining)
+                remaining -= count
+                counts.append(count)
+                if count > 0:
+                    connection.send((self.agent.epsilon, count, self.merged))
+            results = []
+            for connection, count in zip(self.connections, counts):
+                if count > 0:
+                    w1, w2, changes = connection.recv()
+                    p1_wins += w1
+                    p2_wins += w2
+                    results.append(changes)
+            self.merged = self.merge_changes(results)
+        return p1_wins, p2_wins
+
+    def merge_changes(self, results: list[dict]) -> dict:
+        """Merges the changes of the workers into the agent. Returns the new values of the changed entries."""
+        totals = {}
+        for changes in results:
+            for key, (change, visits) in changes.items():
+                if key not in totals:
+                    totals[key] = [0, 0, 0]
+                totals[key][0] += change
+                totals[key][1] += change * visits
+                totals[key][2] += visits
+        tables = (self.agent.q_table1, self.agent.q_table2)
+        merged = {}
+        for (table, state, action), (change, weighted, visits) in totals.items():
+            if state not in tables[table]:
+                tables[table][state] = {}
+            value = tables[table][state].get(action, 0)
+            if self.merge == "average":
+                value += weighted / visits
+            else:
+                value += change
+            tables[table][state][action] = value
+            merged[(table, state, action)] = value
+            if self.agent.dirty is not None:
+                self.agent.dirty.add((table, state))
+        return merged
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
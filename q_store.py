@@ -0,0 +1,293 @@
+"""
+An array backed q value store for DoubleQTableAgent.
+
+The dict q tables hold one inner dict per state, which for most states holds only one action,
+so Python object overhead is most of the memory. DenseQStore instead gives every canonical state
+a row index shared by all tables, and each row has `slots` (action, value) slots per table in two
+preallocated arrays: the action index (see ACTIONS) as uint8 and the value as float32.
+Most states only ever get one or two actions, so a row costs 10 bytes per slot instead of
+a 61 wide row of every action. The actions of a row beyond its slots go to a small overflow dict.
+An empty slot holds EMPTY, which keeps the difference between "not in the table" and "0"
+that the dict tables have (it matters for the max over the next state).
+The arrays grow geometrically as new states are added.
+"""
+
+import random
+import sys
+
+import numpy as np
+
+from blazing8s import DoubleQTableAgent, possible_cards
+
+# The draw action followed by every (number, suite) action. The suite is the optimized suite index, 0 to 4.
+ACTIONS = [()] + [(number, suite) for number in possible_cards for suite in range(5)]
+ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
+EMPTY = 255
+
+
+class DenseQStore:
+    def __init__(
+        self, tables: int = 2, capacity: int = 1024, growth: float = 2.0, slots: int = 2
+    ):
+        self.rows = {}
+        self.growth = growth
+        self.actions = np.full((tables, capacity, slots), EMPTY, dtype=np.uint8)
+        self.values = np.zeros((tables, capacity, slots), dtype=np.float32)
+        # (table, row) -> {action index: value} for the actions that did not fit in the slots of a row.
+        self.overflow = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, state: bytes) -> bool:
+        return state in self.rows
+
+    def row(self, state: bytes) -> int:
+        """The row of state, adding it if it is new."""
+        row = self.rows.get(state)
+        if row is None:
+            row = len(self.rows)
+            if row == self.values.shape[1]:
+                self.grow()
+            self.rows[state] = row
+        return row
+
+    def grow(self) -> None:
+        tables, capacity, slots = self.values.shape
+        new_capacity = int(capacity * self.growth) + 1
+        actions = np.full((tables, new_capacity, slots), EMPTY, dtype=np.uint8)
+        values = np.zeros((tables, new_capacity, slots), dtype=np.float32)
+        actions[:, :capacity] = self.actions
+        values[:, :capacity] = self.values
+        self.actions = actions
+        self.values = values
+
+    def lookup(self, table: int, row: int, action: int) -> float | None:
+        """The value of the action index in row, None if it was never written."""
+        slot = self.actions[table, row].tobytes().find(action)
+        if slot != -1:
+            return float(self.values[table, row, slot])
+        overflow = self.overflow.get((table, row))
+        if overflow is None:
+            return None
+        return overflow.get(action)
+
+    def set(self, table: int, row: int, action: int, value: float) -> None:
+        """Writes the value of the action index in row."""
+        actions = self.actions[table, row].tobytes()
+        slot = actions.find(action)
+        if slot == -1:
+            slot = actions.find(EMPTY)
+            if slot == -1:
+                self.overflow.setdefault((table, row), {})[action] = value
+                return
+            self.actions[table, row, slot] = action
+        self.values[table, row, slot] = value
+
+    def row_values(self, table: int, row: int) -> dict:
+        """action index -> value for every action written in row."""
+        values = {
+            action: value
+            for action, value in zip(
+                self.actions[table, row].tobytes(), self.values[table, row].tolist()
+            )
+            if action != EMPTY
+        }
+        overflow = self.overflow.get((table, row))
+        if overflow is not None:
+            values.update(overflow)
+        return values
+
+    def get(self, table: int, state: bytes, action: tuple) -> float:
+        """The value of action in state, 0 if it was never written."""
+        row = self.rows.get(state)
+        if row is None:
+            return 0
+        value = self.lookup(table, row, ACTION_INDEX[action])
+        return 0 if value is None else value
+
+    def max(self, table: int, state: bytes) -> float:
+        """The largest value written for state, 0 if there is none."""
+        row = self.rows.get(state)
+        if row is None:
+            return 0
+        values = self.row_values(table, row)
+        return max(values.values()) if values else 0
+
+    def memory(self, rows: int | None = None) -> int:
+        """
+        Bytes used by the arrays, the row index and the overflow.
+        With rows only that many rows of the arrays are counted, the arrays are allocated with room to grow.
+        """
+        tables, capacity, slots = self.values.shape
+        row_bytes = tables * slots * (self.actions.itemsize + self.values.itemsize)
+        size = row_bytes * (capacity if rows is None else rows)
+        size += sys.getsizeof(self.rows) + sum(sys.getsizeof(k) for k in self.rows)
+        size += sys.getsizeof(self.overflow)
+        for key, overflow in self.overflow.items():
+            size += sys.getsizeof(key) + sys.getsizeof(overflow)
+            size += sum(sys.getsizeof(v) for v in overflow.values())
+        return size
+
+    def clear_table(self, table: int) -> None:
+        """Removes every value of table. The rows stay, they are shared with the other tables."""
+        self.actions[table] = EMPTY
+        self.values[table] = 0
+        for key in [key for key in self.overflow if key[0] == table]:
+            del self.overflow[key]
+
+    def table(self, table: int) -> "DenseTable":
+        return DenseTable(self, table)
+
+    def to_dict(self, table: int) -> dict:
+        """The table as a dict q table, as used by DoubleQTableAgent."""
+        q_table = {}
+        for state, row in self.rows.items():
+            values = self.row_values(table, row)
+            if values:
+                q_table[state] = {ACTIONS[i]: value for i, value in values.items()}
+        return q_table
+
+    @staticmethod
+    def from_dicts(*q_tables: dict) -> "DenseQStore":
+        states = set()
+        for q_table in q_tables:
+            states.update(q_table)
+        store = DenseQStore(len(q_tables), max(len(states), 1))
+        for table, q_table in enumerate(q_tables):
+            for state, actions in q_table.items():
+                row = store.row(state)
+                for action, value in actions.items():
+                    store.set(table, row, ACTION_INDEX[action], value)
+        return store
+
+
+class DenseTable:
+    """
+    One table of a DenseQStore seen as a dict q table of packed state -> {action: value},
+    with the parts of the dict interface checkpoint.py uses.
+    """
+
+    def __init__(self, store: DenseQStore, table: int):
+        self.store = store
+        self.table = table
+
+    def __getitem__(self, state: bytes) -> dict:
+        row = self.store.rows.get(state)
+        values = {} if row is None else self.store.row_values(self.table, row)
+        if not values:
+            raise KeyError(state)
+        return {ACTIONS[i]: value for i, value in values.items()}
+
+    def __len__(self) -> int:
+        return sum(
+            1 for row in self.store.rows.values() if self.store.row_values(self.table, row)
+        )
+
+    def update(self, q_table: dict) -> None:
+        for state, actions in q_table.items():
+            row = self.store.row(state)
+            for action, value in actions.items():
+                self.store.set(self.table, row, ACTION_INDEX[action], value)
+
+    def clear(self) -> None:
+        self.store.clear_table(self.table)
+
+    def to_dict(self) -> dict:
+        return self.store.to_dict(self.table)
+
+
+class DenseDoubleQTableAgent(DoubleQTableAgent):
+    """
+    DoubleQTableAgent with both q tables kept in a DenseQStore.
+    The learning rule is the same, and so are the hit counters and the dirty, changes and visits hooks;
+    q_table1 and q_table2 are only built on write_q_table.
+    """
+
+    def __init__(
+        self,
+        epsilon: float = 0.01,
+        alpha: float = 0.5,
+        gamma: float = 0.95,
+        file_name: str | None = None,
+        capacity: int = 1024,
+        **kwargs,
+    ):
+        super().__init__(epsilon, alpha, gamma, file_name, **kwargs)
+        if self.q_table1 or self.q_table2:
+            self.store = DenseQStore.from_dicts(self.q_table1, self.q_table2)
+        else:
+            self.store = DenseQStore(2, capacity)
+        self.q_table1 = {}
+        self.q_table2 = {}
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def get_q_value(self, state: tuple, action: tuple) -> float:
+        self.q_table_attempts += 1
+        sorting_indices, state = self.canonical_key(state)
+        table = 0 if random.random() < 0.5 else 1
+        row = self.store.rows.get(state)
+        if row is None:
+            return 0
+        value = self.store.lookup(
+            table, row, ACTION_INDEX[self.optimize_action(action, sorting_indices)]
+        )
+        if value is None:
+            return 0
+        self.q_table_hits += 1
+        return value
+
+    def update_q_value(
+        self, state: tuple, action: tuple, next_state: tuple, reward: float | None = None
+    ) -> None:
+        # One pass like DoubleQTableAgent.update_q_value, the prediction is the stored value.
+        if reward is None:
+            reward = self.reward(next_state)
+        sorting_indices, state = self.canonical_key(state)
+        action = self.optimize_action(action, sorting_indices)
+        _, next_state = self.canonical_key(next_state)
+
+        table = 0 if random.random() < 0.5 else 1
+        row = self.store.row(state)
+        i = ACTION_INDEX[action]
+        self.q_table_attempts += 1
+        predict = self.store.lookup(table, row, i)
+        if predict is None:
+            predict = 0
+        else:
+            self.q_table_hits += 1
+        target = reward + self.gamma * self.store.max(table, next_state)
+        change = self.alpha * (target - predict)
+        self.store.set(table, row, i, predict + change)
+        if self.dirty is not None:
+            self.dirty.add((table, state))
+        if self.changes is not None:
+            key = (table, state, action)
+            if key not in self.changes:
+                self.changes[key] = [0, 0]
+            self.changes[key][0] += change
+            self.changes[key][1] += 1
+        if self.visits is not None:
+            self.visits[state] = self.visits.get(state, 0) + 1
+
+    def action_values(self, state: tuple, possible_actions: list) -> list:
+        sorting_indices, state = self.canonical_key(state)
+        row = self.store.rows.get(state)
+        if row is None:
+            return [0] * len(possible_actions)
+        values1 = self.store.row_values(0, row)
+        values2 = self.store.row_values(1, row)
+        values = []
+        for action in possible_actions:
+            i = ACTION_INDEX[self.optimize_action(action, sorting_indices)]
+            values.append(values1.get(i, 0) + values2.get(i, 0))
+        return values
+
+    def write_q_table(self, file_name: str | None = None, mapped: bool = False):
+        self.q_table1 = self.store.to_dict(0)
+        self.q_table2 = self.store.to_dict(1)
+        super().write_q_table(file_name, mapped)
+        self.q_table1 = {}
+        self.q_table2 = {}
@@ -0,0 +1,408 @@
+"""
+An on-disk q table format that can be memory mapped and queried in place,
+so loading a table does not mean unpickling the whole thing into memory.
+Several processes opening the same file share its pages through the page cache.
+
+All numbers are little endian. The file is laid out as:
+    header:         magic b"B8QT", version (u16), flags (u16), number of states (u64),
+                    number of entries (u64), size of the key blob (u64)
+    state offsets:  u64[states + 1], where the packed key of state i starts in the key blob
+    entry offsets:  u64[states + 1], where the actions of state i start in the entry arrays
+    actions:        u8[entries], the action of every entry (see pack_action)
+    values:         f64[entries], the q value of every entry
+    visits:         u32[states], how many times each state was updated, only if flags has HAS_VISITS
+    key blob:       the packed state keys (see state_keys.py) one after another
+
+States are sorted by their packed key and the actions of a state by their code,
+so a state is found with a binary search over the state offsets.
+
+load_q_table reads either this format or a pickled table one state at a time,
+dropping the states a `keep` predicate rejects before they are put into the table.
+Only this format is really streamed: loading it holds the kept states and nothing else,
+while a pickled table is in memory as a whole until all of its states have been looked at.
+
+Convert the pickled tables of a DoubleQTableAgent with:
+    python q_table_file.py convert <file_name>
+which reads <file_name>_1 and <file_name>_2 and writes <file_name>_1.qt and <file_name>_2.qt.
+When there is no <file_name>_1 it converts the single table of an Agent, for example
+    python q_table_file.py convert q_tables/<file_name>
+writes q_tables/<file_name>.qt, which Agent(file_name=<file_name>) then loads instead of the pickled table.
+
+Tables saved before reads stopped adding entries are full of states whose actions are all 0,
+which the agents treat the same as missing states. Remove them from all the tables of an agent with:
+    python q_table_file.py compact <file_name>
+"""
+
+import mmap
+from array import array
+import os
+import pickle
+import struct
+import sys
+from collections import Counter
+from typing import Callable, Iterator
+
+from state_keys import ENEMY_HAND_LENGTH, HAND_SIZE, pack_state
+
+MAGIC = b"B8QT"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQQ")
+HAS_VISITS = 1
+EXTENSION = ".qt"
+
+
+def pack_action(action: tuple) -> int:
+    """The draw action () is 0, playing a card (number, suite) is number * 5 + suite."""
+    if action == ():
+        return 0
+    return action[0] * 5 + action[1]
+
+
+def unpack_action(code: int) -> tuple:
+    if code == 0:
+        return ()
+    return (code // 5, code % 5)
+
+
+def padding(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+def little_endian(numbers: array) -> array:
+    if sys.byteorder == "big":
+        numbers.byteswap()
+    return numbers
+
+
+def write_q_table_file(q_table, path: str, visits: dict | None = None) -> None:
+    """
+    Writes a q table (a dict of packed state key -> {action: value}, or anything with the same items())
+    to path. The file is written next to path first and then moved over it, so a table that is
+    currently mapped from path stays valid.
+    visits is an optional dict of packed state key -> number of updates, states missing from it get 0.
+    """
+    items = sorted(q_table.items(), key=lambda item: item[0])
+    keys = [k for k, _ in items]
+    # Arrays hold the numbers unboxed and are written without building a packed copy of them.
+    state_offsets = array("Q", [0])
+    entry_offsets = array("Q", [0])
+    actions = bytearray()
+    values = array("d")
+    for k, state_actions in items:
+        state_offsets.append(state_offsets[-1] + len(k))
+        for action, value in sorted(
+            state_actions.items(), key=lambda item: pack_action(item[0])
+        ):
+            actions.append(pack_action(action))
+            values.append(value)
+        entry_offsets.append(len(values))
+    blob = b"".join(keys)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        flags = HAS_VISITS if visits is not None else 0
+        f.write(HEADER.pack(MAGIC, VERSION, flags, len(keys), len(values), len(blob)))
+        f.write(little_endian(state_offsets))
+        f.write(little_endian(entry_offsets))
+        f.write(actions)
+        f.write(padding(len(actions)))
+        f.write(little_endian(values))
+        if visits is not None:
+            f.write(little_endian(array("I", (visits.get(k, 0) for k in keys))))
+            f.write(padding(len(keys) * 4))
+        f.write(blob)
+    os.replace(temp_path, path)
+
+
+class MappedQTable:
+    """
+    A q table backed by a memory mapped file written by write_q_table_file.
+    It can be used in place of the dict q tables of the agents: reads come from the file,
+    and any state that is written to (or fetched with [] so it can be updated in place)
+    is copied into an in-memory overlay. The file itself is never modified.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, flags, self.states, self.entries, blob_size = HEADER.unpack_from(
+            self.mmap
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a q table file")
+        if version != VERSION:
+            raise ValueError(f"{path} has version {version}, expected {VERSION}")
+        view = self.view = memoryview(self.mmap)
+        offset = HEADER.size
+        self.state_offsets = view[offset : offset + (self.states + 1) * 8].cast("Q")
+        offset += (self.states + 1) * 8
+        self.entry_offsets = view[offset : offset + (self.states + 1) * 8].cast("Q")
+        offset += (self.states + 1) * 8
+        self.actions = view[offset : offset + self.entries]
+        offset += self.entries + len(padding(self.entries))
+        self.values = view[offset : offset + self.entries * 8].cast("d")
+        offset += self.entries * 8
+        self.visits = None
+        if flags & HAS_VISITS:
+            self.visits = view[offset : offset + self.states * 4].cast("I")
+            offset += self.states * 4 + len(padding(self.states * 4))
+        self.blob = view[offset : offset + blob_size]
+        self.overlay = {}
+        self.added = 0
+
+    def key(self, i: int) -> bytes:
+        return bytes(self.blob[self.state_offsets[i] : self.state_offsets[i + 1]])
+
+    def find(self, key: bytes) -> int:
+        """The index of key in the file, or -1."""
+        low = 0
+        high = self.states
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.states and self.key(low) == key:
+            return low
+        return -1
+
+    def read_actions(self, i: int) -> dict:
+        return {
+            unpack_action(self.actions[j]): self.values[j]
+            for j in range(self.entry_offsets[i], self.entry_offsets[i + 1])
+        }
+
+    def get(self, key: bytes, default=None):
+        if key in self.overlay:
+            return self.overlay[key]
+        i = self.find(key)
+        if i == -1:
+            return default
+        return self.read_actions(i)
+
+    def __getitem__(self, key: bytes) -> dict:
+        if key in self.overlay:
+            return self.overlay[key]
+        i = self.find(key)
+        if i == -1:
+            raise KeyError(key)
+        self.overlay[key] = self.read_actions(i)
+        return self.overlay[key]
+
+    def __setitem__(self, key: bytes, value: dict) -> None:
+        if key not in self.overlay and self.find(key) == -1:
+            self.added += 1
+        self.overlay[key] = value
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self.overlay or self.find(key) != -1
+
+    def __len__(self) -> int:
+        return self.states + self.added
+
+    def items(self):
+        for k, v in self.overlay.items():
+            yield k, v
+        for i in range(self.states):
+            k = self.key(i)
+            if k not in self.overlay:
+                yield k, self.read_actions(i)
+
+    def __iter__(self):
+        for k, _ in self.items():
+            yield k
+
+    def close(self) -> None:
+        self.state_offsets.release()
+        self.entry_offsets.release()
+        self.actions.release()
+        self.values.release()
+        self.blob.release()
+        if self.visits is not None:
+            self.visits.release()
+        self.view.release()
+        self.mmap.close()
+
+
+def hand_size_at_most(size: int) -> Callable:
+    """Keeps the states where the agent has at most `size` cards."""
+
+    def keep(key: bytes, visits: int | None) -> bool:
+        return key[HAND_SIZE] <= size
+
+    return keep
+
+
+def enemy_hand_size_at_most(size: int) -> Callable:
+    """Keeps the states where the enemy has at most `size` cards."""
+
+    def keep(key: bytes, visits: int | None) -> bool:
+        return key[ENEMY_HAND_LENGTH] <= size
+
+    return keep
+
+
+def min_visits(count: int) -> Callable:
+    """Keeps the states that were updated at least `count` times. Tables without visit counts are kept whole."""
+
+    def keep(key: bytes, visits: int | None) -> bool:
+        return visits is None or visits >= count
+
+    return keep
+
+
+class LoadSummary:
+    """Counts the kept and dropped states by hand size while a table is loaded."""
+
+    def __init__(self):
+        self.kept = Counter()
+        self.dropped = Counter()
+
+    def add(self, key: bytes, kept: bool) -> None:
+        if kept:
+            self.kept[key[HAND_SIZE]] += 1
+        else:
+            self.dropped[key[HAND_SIZE]] += 1
+
+    def __str__(self):
+        kept = sum(self.kept.values())
+        dropped = sum(self.dropped.values())
+        total = max(kept + dropped, 1)
+        lines = [
+            f"Cut {dropped} items from q_table",
+            f"That is {dropped / total * 100}%",
+            "Hand size: kept / dropped",
+        ]
+        for size in sorted(self.kept.keys() | self.dropped.keys()):
+            lines.append(f"{size:9}: {self.kept[size]} / {self.dropped[size]}")
+        return "\n".join(lines)
+
+
+def iter_q_table(path: str) -> Iterator[tuple[bytes, Callable, int | None]]:
+    """
+    Yields (packed state key, function returning the actions dict, visits) for every state in the file at path,
+    which is either in the mapped format or a pickled dict. The actions are only read when the function is called.
+    A mapped file is read in place, so only what the caller keeps takes memory.
+    A pickled table has to be unpickled as a whole, so the peak memory is the whole table; its states
+    are removed from it as they are yielded, so rejected states are freed right away and kept ones are
+    not held twice.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+    if magic == MAGIC:
+        q_table = MappedQTable(path)
+        try:
+            for i in range(q_table.states):
+                visits = q_table.visits[i] if q_table.visits is not None else None
+                yield q_table.key(i), lambda i=i: q_table.read_actions(i), visits
+        finally:
+            q_table.close()
+        return
+    with open(path, "rb") as f:
+        q_table = pickle.load(f)
+    while q_table:
+        key, actions = q_table.popitem()
+        if not isinstance(key, bytes):
+            key = pack_state(key)
+        yield key, lambda actions=actions: actions, None
+
+
+def load_q_table(
+    path: str, keep: Callable | None = None, summary: LoadSummary | None = None
+) -> dict:
+    """
+    Loads the table at path into a dict, only keeping the states for which keep(key, visits) is true.
+    The actions of a state are only read once it is kept.
+    """
+    q_table = {}
+    for key, read_actions, visits in iter_q_table(path):
+        kept = keep is None or keep(key, visits)
+        if summary is not None:
+            summary.add(key, kept)
+        if kept:
+            q_table[key] = read_actions()
+    return q_table
+
+
+def zero_only(actions: dict) -> bool:
+    """Whether no action of a state has a value other than 0, so the state reads the same as a missing one."""
+    return not any(actions.values())
+
+
+def dict_memory(q_table: dict) -> int:
+    """An estimate of the bytes a q table takes as a dict, counting every key, action and value object."""
+    size = sys.getsizeof(q_table)
+    for key, actions in q_table.items():
+        size += sys.getsizeof(key) + sys.getsizeof(actions)
+        for action, value in actions.items():
+            size += sys.getsizeof(action) + sys.getsizeof(value)
+    return size
+
+
+def compact(path: str) -> tuple[int, int, int, int]:
+    """
+    Removes the zero only states from the table at path and writes it back in the same format.
+    Returns (states before, states after, memory before, memory after), the memory as estimated by dict_memory.
+    """
+    with open(path, "rb") as f:
+        mapped = f.read(len(MAGIC)) == MAGIC
+    q_table = {}
+    visits = {}
+    for key, read_actions, state_visits in iter_q_table(path):
+        q_table[key] = read_actions()
+        if state_visits is not None:
+            visits[key] = state_visits
+    states = len(q_table)
+    memory = dict_memory(q_table)
+    for key in [k for k, actions in q_table.items() if zero_only(actions)]:
+        del q_table[key]
+        visits.pop(key, None)
+    if mapped:
+        write_q_table_file(q_table, path, visits if visits else None)
+    else:
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump(q_table, f)
+        os.replace(f"{path}.tmp", path)
+    return states, len(q_table), memory, dict_memory(q_table)
+
+
+def convert(file_name: str) -> None:
+    """
+    Converts the pickled <file_name>_1 and <file_name>_2 tables of a DoubleQTableAgent to the mapped format,
+    or the pickled table <file_name> of an Agent when there is no <file_name>_1.
+    Each table is unpickled once, and its states are moved out of it as they are converted.
+    """
+    suffixes = ["_1", "_2"] if os.path.exists(f"{file_name}_1") else [""]
+    for suffix in suffixes:
+        q_table = load_q_table(f"{file_name}{suffix}")
+        write_q_table_file(q_table, f"{file_name}{suffix}{EXTENSION}")
+        print(f"Wrote {len(q_table)} states to {file_name}{suffix}{EXTENSION}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ["convert", "compact"]:
+        print("Usage: python q_table_file.py convert|compact <file_name>")
+        sys.exit(1)
+    if sys.argv[1] == "convert":
+        convert(sys.argv[2])
+        sys.exit(0)
+    total_before = 0
+    total_after = 0
+    for suffix in ["_1", "_2", f"_1{EXTENSION}", f"_2{EXTENSION}"]:
+        path = f"{sys.argv[2]}{suffix}"
+        if not os.path.exists(path):
+            continue
+        states, kept, memory, compacted = compact(path)
+        total_before += memory
+        total_after += compacted
+        print(
+            f"{path}: {states} -> {kept} states,"
+            f" {memory / 2**20:.1f} -> {compacted / 2**20:.1f} MiB in memory"
+        )
+    if total_before:
+        print(
+            f"Saved {(total_before - total_after) / 2**20:.1f} MiB,"
+            f" {(1 - total_after / total_before) * 100:.1f}% of the memory"
+        )
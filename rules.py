@@ -0,0 +1,113 @@
+"""
+Precomputed playability and legal action tables.
+
+Cards and top cards are identified by their cell in the 13x5 hand grid of the agent state:
+    cell = (number - 1) * 5 + suite
+where suite is the value of the suite (1 to 4), and 0 for swaps and 8s since their color is only
+chosen when they are played. Both engines use the same cells, so the tables serve blazing8s.py and game.py.
+
+A set of cells, like the cards in a hand, is an int with bit `cell` set for every cell in it.
+A set of actions is an int with bit `pack_action(action)` set for every action in it (see q_table_file.py),
+so bit 0 is the draw action and playing a card in cell c is bit c + 5.
+"""
+
+from q_table_file import pack_action, unpack_action
+
+CELLS = 65
+SWAP = 0
+EIGHT = 7 * 5
+
+# The action bit for drawing.
+DRAW = 1 << pack_action(())
+
+
+def cell(number: int, suite: int) -> int:
+    return (number - 1) * 5 + suite
+
+
+def playable(card: int, top: int) -> bool:
+    """A card can be played on a card of the same suite or number, and swaps and 8s on anything."""
+    number, suite = divmod(card, 5)
+    top_number, top_suite = divmod(top, 5)
+    return card == SWAP or card == EIGHT or number == top_number or suite == top_suite
+
+
+# PLAYABLE[top][card] is whether the card in cell `card` can be played on the top card in cell `top`.
+PLAYABLE = tuple(
+    tuple(playable(card, top) for card in range(CELLS)) for top in range(CELLS)
+)
+# PLAYABLE_CELLS[top] is the set of cells that can be played on top.
+PLAYABLE_CELLS = tuple(
+    sum(1 << card for card in range(CELLS) if PLAYABLE[top][card])
+    for top in range(CELLS)
+)
+# The cells of every number, 1 to 13.
+NUMBER_CELLS = (0,) + tuple(0b11111 << cell(number, 0) for number in range(1, 14))
+
+# An 8 is played as one of the four colors, and a swap either as is or as one of the four colors.
+EIGHT_ACTION = 1 << pack_action((8, 0))
+EIGHT_COLORS = sum(1 << pack_action((8, suite)) for suite in range(1, 5))
+SWAP_ACTION = 1 << pack_action((1, 0))
+SWAP_COLORS = sum(1 << pack_action((1, suite)) for suite in range(1, 5))
+
+ACTIONS = [unpack_action(code) for code in range(pack_action((13, 4)) + 1)]
+
+# The set of cells of every 13x5 row of counts seen so far.
+row_cells = {}
+
+
+def hand_cells(hand: tuple) -> int:
+    """The set of cells with at least one card in a 13x5 hand grid."""
+    cells = 0
+    shift = 0
+    for row in hand:
+        bits = row_cells.get(row)
+        if bits is None:
+            bits = row_cells[row] = sum(1 << i for i, count in enumerate(row) if count)
+        cells |= bits << shift
+        shift += 5
+    return cells
+
+
+def legal_actions(cells: int, top: int, expand_swaps: bool = False) -> int:
+    """
+    The set of actions that play a card from the set of cells on top, not including the draw action.
+    8s are expanded to the four colors. With expand_swaps, swaps are expanded to the four colors as well.
+    """
+    actions = (cells & PLAYABLE_CELLS[top]) << 5
+    if actions & EIGHT_ACTION:
+        actions ^= EIGHT_ACTION | EIGHT_COLORS
+    if expand_swaps and actions & SWAP_ACTION:
+        actions ^= SWAP_ACTION | SWAP_COLORS
+    return actions
+
+
+def hand_legal_actions(hand: tuple, top: int, expand_swaps: bool = False) -> int:
+    """legal_actions for a 13x5 hand grid."""
+    return legal_actions(hand_cells(hand), top, expand_swaps)
+
+
+def action_list(actions: int) -> list[tuple]:
+    """The actions in a set of actions, ordered by their code, so the draw action comes first."""
+    result = []
+    while actions:
+        low = actions & -actions
+        result.append(ACTIONS[low.bit_length() - 1])
+        actions ^= low
+    return result
+
+
+# The action lists of every set of playable cells seen so far, without and with expanded swaps.
+playable_action_lists = ({}, {})
+
+
+def playable_actions(cells: int, top: int, expand_swaps: bool = False) -> list[tuple]:
+    """action_list(legal_actions(cells, top, expand_swaps)), cached on the playable cells."""
+    playable = cells & PLAYABLE_CELLS[top]
+    lists = playable_action_lists[expand_swaps]
+    actions = lists.get(playable)
+    if actions is None:
+        actions = lists[playable] = tuple(
+            action_list(legal_actions(playable, top, expand_swaps))
+        )
+    return list(actions)
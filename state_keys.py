@@ -0,0 +1,173 @@
+"""
+Compact q table keys for the agent states.
+
+The agent works with states of the form
+    (enemy_hand_length, (top_number, top_suite), hand_size, hand, drew, last_player_played)
+where the optimized hand is a flat tuple of 65 card counts (see Agent.optimize_state).
+Using those tuples as dictionary keys means hashing and comparing dozens of ints on every
+lookup and storing hundreds of bytes per key.
+
+A packed key is a short bytes object instead:
+    byte 0: enemy hand length
+    byte 1: top card number
+    byte 2: top card suite
+    byte 3: hand size
+    byte 4: drew
+    byte 5: last player played
+    byte 6...: the index of every card in the hand, in increasing order, once per card.
+So a hand of 5 cards is an 11 byte key. Every field must fit in a byte.
+"""
+
+import pickle
+import sys
+from collections import OrderedDict
+
+ENEMY_HAND_LENGTH = 0
+TOP_NUMBER = 1
+TOP_SUITE = 2
+HAND_SIZE = 3
+DREW = 4
+LAST_PLAYER_PLAYED = 5
+HEADER_SIZE = 6
+
+HAND_CELLS = 65
+
+
+def pack_state(state: tuple) -> bytes:
+    """Packs an optimized state tuple into a bytes key."""
+    cells = bytearray(
+        (
+            state[0],
+            state[1][0],
+            state[1][1],
+            state[2],
+            state[4],
+            state[5],
+        )
+    )
+    for i, count in enumerate(state[3]):
+        if count:
+            cells.extend([i] * count)
+    return bytes(cells)
+
+
+def unpack_state(key: bytes) -> tuple:
+    """The inverse of pack_state."""
+    hand = [0] * HAND_CELLS
+    for i in key[HEADER_SIZE:]:
+        hand[i] += 1
+    return (
+        key[ENEMY_HAND_LENGTH],
+        (key[TOP_NUMBER], key[TOP_SUITE]),
+        key[HAND_SIZE],
+        tuple(hand),
+        bool(key[DREW]),
+        bool(key[LAST_PLAYER_PLAYED]),
+    )
+
+
+def pack_hand(hand: tuple, sorting_indices: tuple) -> bytes:
+    """
+    Packs a 13x5 hand grid with its suites reordered by sorting_indices.
+    This is the hand part of pack_state(Agent.optimize_state(state, sorting_indices)).
+    """
+    cells = bytearray()
+    i = 0
+    for suite in sorting_indices:
+        for row in hand:
+            count = row[suite]
+            if count:
+                cells.extend([i] * count)
+            i += 1
+    return bytes(cells)
+
+
+class CanonicalCache:
+    """
+    A bounded least recently used cache for the suit sorting done when turning a state into a q table key.
+    It is keyed on the raw 13x5 hand grid and stores the sorting indices of the hand (see
+    Agent.get_sorting_indices) together with the hand packed in that suite order.
+    Every lookup counts as one hit or one miss, so the counters show how well the cache size fits a training run.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, hand: tuple) -> tuple[tuple, bytes]:
+        """The sorting indices of hand and the hand packed with them."""
+        entry = self.entries.get(hand)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(hand)
+            return entry
+        self.misses += 1
+        suite_counts = [0 for _ in range(5)]
+        for row in hand:
+            for i in range(5):
+                suite_counts[i] += row[i]
+        sorting_indices = tuple(sorted(range(5), key=lambda k: suite_counts[k]))
+        entry = (sorting_indices, pack_hand(hand, sorting_indices))
+        self.entries[hand] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Shared by every agent in the process unless they are given their own cache.
+canonical_cache = CanonicalCache()
+
+
+def is_packed(q_table: dict) -> bool:
+    """Tables written before packed keys were introduced use state tuples as keys."""
+    for k in q_table:
+        return isinstance(k, bytes)
+    return True
+
+
+def convert_table(q_table: dict) -> dict:
+    """Converts a q table with state tuple keys to packed keys. The action dictionaries are kept as they are."""
+    if is_packed(q_table):
+        return q_table
+    return {pack_state(k): v for k, v in q_table.items()}
+
+
+if __name__ == "__main__":
+    # Converts pickled q tables to packed keys:
+    #   python state_keys.py <old file> <new file>
+    if len(sys.argv) != 3:
+        print("Usage: python state_keys.py <old file> <new file>")
+        sys.exit(1)
+    with open(sys.argv[1], "rb") as f:
+        q_table = pickle.load(f)
+    if is_packed(q_table):
+        print("The table already uses packed keys")
+        sys.exit(0)
+    converted = {}
+    for k, v in q_table.items():
+        key = pack_state(k)
+        if unpack_state(key) != k:
+            raise Exception(f"State {k} does not convert losslessly")
+        converted[key] = v
+    with open(sys.argv[2], "wb+") as f:
+        pickle.dump(converted, f)
+    print(f"Converted {len(converted)} states")
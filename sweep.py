@@ -0,0 +1,193 @@
+"""
+A hyperparameter sweep for DoubleQTableAgent against SimpleStrategyPlayer with successive halving.
+
+Every (epsilon, gamma, alpha, epsilon_multiplier) configuration of the grid trains like the
+`__main__` block of blazing8s.py: `inner` games per outer iteration, with epsilon multiplied by
+epsilon_multiplier every outer iteration. Instead of training the configurations one after another
+for all `outer` iterations, they are trained in a process pool up to a series of rungs:
+min_outer, min_outer * eta, min_outer * eta ** 2, ... outer iterations.
+At every rung the configurations are ranked by their win rate over the games since the previous rung,
+and only the best 1 / eta of them train on to the next rung. Once fewer configurations are left than
+processes, every survivor trains with a ParallelTrainer on its share of the processes.
+
+The tables of a configuration are written after every rung as
+{file_prefix}_simple_strategy_{epsilon}e{gamma}g{alpha}a.bin, like the training loop, and read back
+for the next rung. When the grid has more than one epsilon multiplier, {multiplier}m is added
+before .bin so the configurations do not overwrite each other. A sweep always starts from empty tables.
+
+Run with, for example:
+    python sweep.py --epsilons 0.04 0.02 --gammas 1 0.99 --alphas 0.35 0.5 --outer 100 --inner 300
+"""
+
+import argparse
+import itertools
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from blazing8s import (
+    BetterAgentPlayer,
+    DoubleQTableAgent,
+    Game,
+    SimpleStrategyPlayer,
+    card_stream,
+)
+from parallel_training import ParallelTrainer
+
+
+def table_name(file_prefix: str, config: tuple, with_multiplier: bool) -> str:
+    epsilon, gamma, alpha, multiplier = config
+    name = f"{file_prefix}_simple_strategy_{epsilon}e{gamma}g{alpha}a"
+    if with_multiplier:
+        name += f"{multiplier}m"
+    return f"{name}.bin"
+
+
+def rungs(outer: int, min_outer: int, eta: int) -> list[int]:
+    """The outer iterations after which the configurations are compared, ending with outer."""
+    milestones = []
+    milestone = min_outer
+    while milestone < outer:
+        milestones.append(milestone)
+        milestone *= eta
+    return milestones + [outer]
+
+
+def train(task: tuple) -> tuple:
+    """
+    Trains one configuration from outer iteration first_outer up to last_outer.
+    Returns (config, wins, losses) for the games of those iterations.
+    """
+    config, name, first_outer, last_outer, inner, workers, seed = task
+    epsilon, gamma, alpha, multiplier = config
+    random.seed(seed)
+    card_stream.seed(seed)
+    agent = DoubleQTableAgent(
+        epsilon=epsilon,
+        alpha=alpha,
+        gamma=gamma,
+        file_name=name if first_outer > 0 else None,
+    )
+    player1 = BetterAgentPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    trainer = None
+    if workers > 1:
+        trainer = ParallelTrainer(agent, workers=workers, seed=seed)
+    wins = 0
+    losses = 0
+    for j in range(first_outer, last_outer):
+        agent.epsilon = epsilon * multiplier ** (j + 1)
+        if trainer is not None:
+            p1_wins, p2_wins = trainer.play(inner)
+        else:
+            p1_wins = 0
+            p2_wins = 0
+            for _ in range(inner):
+                winner = Game(player1, player2).start()
+                if winner == 1:
+                    p1_wins += 1
+                elif winner == 2:
+                    p2_wins += 1
+        wins += p1_wins
+        losses += p2_wins
+    if trainer is not None:
+        trainer.close()
+    agent.write_q_table(name)
+    return config, wins, losses
+
+
+def sweep(
+    configs: list[tuple],
+    outer: int,
+    inner: int,
+    min_outer: int,
+    eta: int,
+    processes: int,
+    file_prefix: str,
+    seed: int,
+) -> tuple[dict, int]:
+    """
+    Runs the successive halving sweep. Returns ({config: (win rate of its last rung, outer iterations trained)},
+    games played).
+    """
+    with_multiplier = len({config[3] for config in configs}) > 1
+    names = {config: table_name(file_prefix, config, with_multiplier) for config in configs}
+    results = {}
+    alive = list(configs)
+    games = 0
+    trained = 0
+    for rung, milestone in enumerate(rungs(outer, min_outer, eta)):
+        workers = max(1, processes // len(alive))
+        tasks = [
+            (config, names[config], trained, milestone, inner, workers, seed + rung * len(configs) + i)
+            for i, config in enumerate(alive)
+        ]
+        with ProcessPoolExecutor(min(processes, len(alive))) as pool:
+            for config, wins, losses in pool.map(train, tasks):
+                results[config] = (wins / max(wins + losses, 1), milestone)
+                games += (milestone - trained) * inner
+        print(f"Rung {rung}: {milestone} outer iterations, {len(alive)} configurations")
+        for config in sorted(alive, key=lambda c: results[c][0], reverse=True):
+            print(f"  {names[config]:60} {results[config][0] * 100:6.2f}%")
+        trained = milestone
+        alive = sorted(alive, key=lambda c: results[c][0], reverse=True)[
+            : math.ceil(len(alive) / eta)
+        ]
+    return results, games
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--epsilons", type=float, nargs="+", default=[0.04])
+    parser.add_argument("--gammas", type=float, nargs="+", default=[1])
+    parser.add_argument("--alphas", type=float, nargs="+", default=[0.35])
+    parser.add_argument("--epsilon-multipliers", type=float, nargs="+", default=[0.999])
+    parser.add_argument("--outer", type=int, default=100)
+    parser.add_argument("--inner", type=int, default=300)
+    parser.add_argument("--min-outer", type=int, default=10)
+    parser.add_argument("--eta", type=int, default=2, help="Keep the best 1 / eta at every rung")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--file-prefix", default="double_q_table_")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.eta < 2:
+        parser.error("--eta must be at least 2")
+
+    # Whole numbers like the gamma of 1 in the training loop are named without a decimal point.
+    def number(value: float):
+        return int(value) if value == int(value) else value
+
+    configs = list(
+        itertools.product(
+            [number(e) for e in args.epsilons],
+            [number(g) for g in args.gammas],
+            [number(a) for a in args.alphas],
+            [number(m) for m in args.epsilon_multipliers],
+        )
+    )
+    results, games = sweep(
+        configs,
+        args.outer,
+        args.inner,
+        args.min_outer,
+        args.eta,
+        args.processes,
+        args.file_prefix,
+        args.seed,
+    )
+
+    full = len(configs) * args.outer * args.inner
+    finished = [config for config in configs if results[config][1] == args.outer]
+    best = max(finished, key=lambda config: results[config][0])
+    epsilon, gamma, alpha, multiplier = best
+    print()
+    print(
+        f"Best epsilon: {epsilon}, best gamma: {gamma}, best alpha: {alpha}, "
+        f"best epsilon multiplier: {multiplier}"
+    )
+    print(f"Winning % over its last rung: {results[best][0]}")
+    print(
+        f"Played {games} games instead of {full} for the whole grid, "
+        f"{(1 - games / full) * 100:.1f}% of the compute saved"
+    )
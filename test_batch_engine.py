@@ -0,0 +1,42 @@
+import numpy as np
+
+from batch_engine import NO_PLAY, BatchSimpleStrategyPolicy, random_cells
+from blazing8s import Card, Hand, SimpleStrategyPlayer, card_cell, suite_map
+
+
+def tier(policy: BatchSimpleStrategyPolicy, top_suite: int, cell: int) -> int:
+    """The first step of the simple strategy that cell falls in."""
+    return int(np.flatnonzero(policy.TIERS[top_suite][:, cell])[0])
+
+
+def test_batch_simple_strategy_chooses_like_the_scalar_player():
+    rng = np.random.default_rng(0)
+    n = 2000
+    hands = np.zeros((n, 13, 5), dtype=np.int16)
+    for i in range(n):
+        for cell in random_cells(rng, rng.integers(1, 12)):
+            hands[i, cell // 5, cell % 5] += 1
+    top_number = rng.choice([2, 3, 4, 5, 6, 7, 9, 10, 11, 13], size=n)
+    top_suite = rng.integers(0, 5, size=n)
+    policy = BatchSimpleStrategyPolicy()
+    cells, colors = policy(rng, hands, top_number, top_suite, np.full(n, 5), np.zeros(n, dtype=bool))
+
+    player = SimpleStrategyPlayer("Player")
+    eights = 0
+    for i in range(n):
+        player.hand = Hand()
+        for cell in np.repeat(np.arange(65), hands[i].reshape(65)):
+            player.hand.append(Card(cell // 5 + 1, suite_map[cell % 5]))
+        top = Card(int(top_number[i]), suite_map[int(top_suite[i])])
+        card = player.choose_card(top, 5, False, False)
+        if card is None:
+            assert cells[i] == NO_PLAY
+            continue
+        cell = card_cell(card)
+        # Cards in the same step are picked in hand order by the player and at random by the policy.
+        assert tier(policy, top_suite[i], cell) == tier(policy, top_suite[i], cells[i])
+        if card.number == 8:
+            eights += 1
+            suite = 0 if card.suite is None else card.suite.value
+            assert colors[i] == suite
+    assert eights > 50
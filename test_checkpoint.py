@@ -0,0 +1,93 @@
+import copy
+import os
+import random
+
+import checkpoint
+from blazing8s import (
+    BetterAgentPlayer,
+    DoubleQTableAgent,
+    Game,
+    SimpleStrategyPlayer,
+    card_stream,
+)
+
+
+def train(agent: DoubleQTableAgent, games: int, checkpointer=None, snapshot_at=None) -> dict:
+    """Plays games, checkpointing after every one. Returns a copy of the tables after game snapshot_at."""
+    player1 = BetterAgentPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    tables = None
+    for i in range(games):
+        Game(player1, player2).start()
+        if checkpointer is not None:
+            checkpointer.played(1, {"games": i + 1})
+        if i + 1 == snapshot_at:
+            tables = copy.deepcopy((agent.q_table1, agent.q_table2))
+    return tables
+
+
+def wait_for_snapshot(checkpointer: checkpoint.Checkpointer) -> None:
+    if checkpointer.child is not None:
+        os.waitpid(checkpointer.child, 0)
+        checkpointer.child = None
+
+
+def crashed_run(tmp_path, monkeypatch):
+    """
+    Trains a table, saves it, then trains on the loaded table with checkpoints every 10 games and stops
+    after 25 games without close(). Returns the tables at the last checkpoint and the checkpointer.
+    """
+    monkeypatch.chdir(tmp_path)
+    random.seed(0)
+    card_stream.seed(0)
+    agent = DoubleQTableAgent(epsilon=0.1, alpha=0.35, gamma=1)
+    train(agent, 100)
+    agent.write_q_table("table.bin")
+
+    agent = DoubleQTableAgent(epsilon=0.1, alpha=0.35, gamma=1, file_name="table.bin")
+    checkpointer = checkpoint.Checkpointer(agent, "table.bin", interval=10)
+    expected = train(agent, 25, checkpointer, snapshot_at=20)
+    wait_for_snapshot(checkpointer)
+    checkpointer.log.close()
+    return expected, checkpointer
+
+
+def test_resume_keeps_the_loaded_tables(tmp_path, monkeypatch):
+    expected, _ = crashed_run(tmp_path, monkeypatch)
+    assert len(expected[0]) > 1000
+
+    agent = DoubleQTableAgent(file_name="table.bin")
+    checkpointer = checkpoint.Checkpointer(agent, "table.bin", interval=10)
+    assert (agent.q_table1, agent.q_table2) == expected
+    assert checkpointer.progress == {"games": 20}
+    checkpointer.close()
+
+
+def test_resume_without_a_snapshot_replays_onto_the_loaded_tables(tmp_path, monkeypatch):
+    # A crash before the first snapshot was complete leaves only the delta logs.
+    expected, checkpointer = crashed_run(tmp_path, monkeypatch)
+    os.remove("table.bin.checkpoint")
+    assert checkpoint.read_generation("table.bin") == 0
+
+    agent = DoubleQTableAgent(file_name="table.bin")
+    _, progress = checkpoint.resume(agent, "table.bin")
+    assert (agent.q_table1, agent.q_table2) == expected
+    assert progress == {"games": 20}
+
+
+def test_resume_after_a_snapshot_has_its_progress(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    random.seed(0)
+    card_stream.seed(0)
+    agent = DoubleQTableAgent(epsilon=0.1, alpha=0.35, gamma=1)
+    # Only the third checkpoint takes a snapshot. With more, one could be skipped while the child writing
+    # the previous one is still running.
+    checkpointer = checkpoint.Checkpointer(agent, "table.bin", interval=10, snapshot_every=3)
+    train(agent, 30, checkpointer)
+    wait_for_snapshot(checkpointer)
+    checkpointer.log.close()
+    assert checkpoint.read_manifest("table.bin")[1] == {"games": 30}
+
+    resumed = DoubleQTableAgent()
+    assert checkpoint.resume(resumed, "table.bin") == (0, {"games": 30})
+    assert (resumed.q_table1, resumed.q_table2) == (agent.q_table1, agent.q_table2)
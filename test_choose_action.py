@@ -0,0 +1,19 @@
+import copy
+import random
+
+from benchmarks.bench_choose_action import train_and_record
+
+
+def test_greedy_choose_action_leaves_the_tables_unchanged():
+    random.seed(0)
+    agent, decisions = train_and_record(200, 0)
+    agent.epsilon = 0
+
+    keys = [agent.canonical_key(state)[1] for state, _ in decisions]
+    known = [key in agent.q_table1 or key in agent.q_table2 for key in keys]
+    assert sum(known) > len(known) // 2
+
+    tables = copy.deepcopy((agent.q_table1, agent.q_table2))
+    for state, possible_actions in decisions:
+        assert agent.choose_action(state, possible_actions) in possible_actions
+    assert (agent.q_table1, agent.q_table2) == tables
@@ -0,0 +1,63 @@
+import random
+
+import deck_game
+import game
+from blazing8s import BetterAgentPlayer, DoubleQTableAgent, Game, SimpleStrategyPlayer
+
+
+def make_player(module, kind: str, name: str, agent: DoubleQTableAgent):
+    if kind == "random":
+        return module.RandomPlayer(name)
+    if kind == "bad_random":
+        return module.RandomPlayer(name, GOOD_RANDOM=False)
+    if kind == "simple":
+        return module.SimpleStrategyPlayer(name)
+    return module.AgentPlayer(name, agent)
+
+
+class RecordingAgent:
+    """Passes choose_action on to agent and records the states and actions it is given."""
+
+    def __init__(self, agent: DoubleQTableAgent):
+        self.agent = agent
+        self.decisions = []
+
+    def choose_action(self, state: tuple, possible_actions: list) -> tuple:
+        self.decisions.append((state, possible_actions))
+        return self.agent.choose_action(state, possible_actions)
+
+
+def play(module, discord_game, kind1: str, kind2: str, games: int, agent) -> list:
+    """
+    (winner, turns) of seeded games, with the global random module seeded like discord_simulation.py,
+    followed by every decision of the agent.
+    """
+    random.seed(0)
+    agent = RecordingAgent(agent)
+    results = []
+    for seed in range(games):
+        player1 = make_player(module, kind1, "Player 1", agent)
+        player2 = make_player(module, kind2, "Player 2", agent)
+        played = discord_game(player1, player2, seed)
+        results.append((played.loop().name, played.turns))
+    return results + agent.decisions
+
+
+def test_deck_players_play_the_same_games_as_the_discord_players():
+    random.seed(0)
+    agent = DoubleQTableAgent(epsilon=0.04, alpha=0.35, gamma=1)
+    player1 = BetterAgentPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    for seed in range(200):
+        Game(player1, player2, seed=seed).start()
+    agent.epsilon = 0
+
+    for kind1, kind2 in [
+        ("random", "bad_random"),
+        ("simple", "random"),
+        ("agent", "simple"),
+        ("simple", "agent"),
+    ]:
+        discord = play(game, game.DiscordGame, kind1, kind2, 300, agent)
+        deck = play(deck_game, deck_game.DeckGame, kind1, kind2, 300, agent)
+        assert discord == deck, (kind1, kind2)
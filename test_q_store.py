@@ -0,0 +1,69 @@
+import os
+import random
+
+import checkpoint
+from blazing8s import (
+    BetterAgentPlayer,
+    DoubleQTableAgent,
+    Game,
+    SimpleStrategyPlayer,
+    card_stream,
+)
+from q_store import DenseDoubleQTableAgent
+
+
+def train(agent, games: int, checkpointer=None) -> None:
+    random.seed(0)
+    card_stream.seed(0)
+    player1 = BetterAgentPlayer("Player 1", agent=agent)
+    player2 = SimpleStrategyPlayer("Player 2")
+    for i in range(games):
+        Game(player1, player2).start()
+        if checkpointer is not None:
+            checkpointer.played(1, {"games": i + 1})
+
+
+def assert_same_tables(dense: DenseDoubleQTableAgent, tables: tuple) -> None:
+    # The dense store keeps float32 values.
+    for table, q_table in enumerate(tables):
+        dense_table = dense.store.to_dict(table)
+        assert dense_table.keys() == q_table.keys()
+        for state, actions in q_table.items():
+            assert dense_table[state].keys() == actions.keys()
+            for action, value in actions.items():
+                assert abs(dense_table[state][action] - value) < 1e-3
+
+
+def test_dense_agent_learns_like_the_dict_agent():
+    agents = []
+    for cls in [DoubleQTableAgent, DenseDoubleQTableAgent]:
+        agent = cls(epsilon=0.1, alpha=0.35, gamma=1, track_visits=True)
+        agent.dirty = set()
+        agent.changes = {}
+        train(agent, 100)
+        agents.append(agent)
+    dict_agent, dense = agents
+
+    assert_same_tables(dense, (dict_agent.q_table1, dict_agent.q_table2))
+    assert dense.q_table_hits == dict_agent.q_table_hits
+    assert dense.q_table_attempts == dict_agent.q_table_attempts
+    assert dense.dirty == dict_agent.dirty
+    assert dense.visits == dict_agent.visits
+    assert dense.changes.keys() == dict_agent.changes.keys()
+    for key, (change, updates) in dict_agent.changes.items():
+        assert dense.changes[key][1] == updates
+        assert abs(dense.changes[key][0] - change) < 1e-3
+
+
+def test_dense_agent_resumes_from_a_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = DenseDoubleQTableAgent(epsilon=0.1, alpha=0.35, gamma=1)
+    checkpointer = checkpoint.Checkpointer(agent, "table.bin", interval=10, snapshot_every=2)
+    train(agent, 30, checkpointer)
+    if checkpointer.child is not None:
+        os.waitpid(checkpointer.child, 0)
+    checkpointer.log.close()
+
+    resumed = DenseDoubleQTableAgent()
+    assert checkpoint.resume(resumed, "table.bin")[1] == {"games": 30}
+    assert_same_tables(resumed, (agent.store.to_dict(0), agent.store.to_dict(1)))
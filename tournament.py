@@ -0,0 +1,254 @@
+"""
+A round robin tournament between policies of the i.i.d. engine (blazing8s.Game), played in several processes.
+
+The policies are RandomPlayer ("random", and "bad_random" with GOOD_RANDOM=False), SimpleStrategyPlayer
+("simple") and any number of saved tables: DoubleQTableAgent tables with --agent and Agent tables
+(in q_tables/) with --single-agent. The agents act greedily and do not learn.
+
+Every pair of policies plays chunks of games, with the seats swapped every other chunk.
+After every chunk a sequential probability ratio test decides whether the pairing is settled:
+H0 is that the first policy of the pair wins with probability 0.5 - delta, H1 that it wins with
+0.5 + delta, with error rates --alpha and --beta. A pairing stops as soon as the test accepts either,
+or after --max-games games. Drawn games (games that hit the turn limit) do not count for the test.
+
+The report has the win rate of every pairing with its 95% confidence interval, the Elo difference it
+implies and the verdict of the test, and the Elo ratings of all policies fitted to every game played,
+with a mean of 0.
+
+Run with, for example:
+    python tournament.py --agent <file_name> --single-agent <file_name>
+"""
+
+import argparse
+import itertools
+import math
+import multiprocessing
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from blazing8s import (
+    Agent,
+    DoubleQTableAgent,
+    Game,
+    RandomPlayer,
+    SimpleStrategyPlayer,
+)
+from discord_simulation import FrozenAgentPlayer
+
+BUILT_IN = ["random", "bad_random", "simple"]
+
+# Set in every worker by _init_worker, policy name -> agent.
+_agents = {}
+
+
+def _init_worker(agents: dict) -> None:
+    global _agents
+    _agents = agents
+
+
+def make_player(policy: str, name: str):
+    if policy == "random":
+        return RandomPlayer(name)
+    if policy == "bad_random":
+        return RandomPlayer(name, GOOD_RANDOM=False)
+    if policy == "simple":
+        return SimpleStrategyPlayer(name)
+    return FrozenAgentPlayer(name, agent=_agents[policy])
+
+
+def play_chunk(task: tuple) -> tuple:
+    """
+    Plays `games` games between two policies with the seeds first_seed, first_seed + 1, ...
+    Returns (pair, wins of the first policy of the pair, wins of the second policy).
+    """
+    pair, swapped, first_seed, games = task
+    random.seed(first_seed)
+    policy1, policy2 = pair[::-1] if swapped else pair
+    player1 = make_player(policy1, "Player 1")
+    player2 = make_player(policy2, "Player 2")
+    p1_wins = 0
+    p2_wins = 0
+    for seed in range(first_seed, first_seed + games):
+        winner = Game(player1, player2, seed=seed).start()
+        if winner == 1:
+            p1_wins += 1
+        elif winner == 2:
+            p2_wins += 1
+    if swapped:
+        return pair, p2_wins, p1_wins
+    return pair, p1_wins, p2_wins
+
+
+class Pairing:
+    def __init__(self, delta: float, alpha: float, beta: float):
+        self.games = 0
+        self.wins = 0
+        self.losses = 0
+        self.chunks = 0
+        # Log likelihood ratio of H1 against H0 and its bounds.
+        self.llr = 0.0
+        self.win_llr = math.log((0.5 + delta) / (0.5 - delta))
+        self.loss_llr = math.log((0.5 - delta) / (0.5 + delta))
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+        self.verdict = None
+
+    def add(self, games: int, wins: int, losses: int) -> None:
+        self.games += games
+        self.wins += wins
+        self.losses += losses
+        self.llr += wins * self.win_llr + losses * self.loss_llr
+        if self.verdict is None:
+            if self.llr >= self.upper:
+                self.verdict = "first is better"
+            elif self.llr <= self.lower:
+                self.verdict = "second is better"
+
+    def win_rate(self) -> float:
+        """The win rate of the first policy, counting draws as half a win."""
+        return (self.wins + (self.games - self.wins - self.losses) / 2) / self.games
+
+    def win_rate_error(self) -> float:
+        """Half width of the 95% confidence interval of the win rate."""
+        p = self.win_rate()
+        return 1.96 * math.sqrt(p * (1 - p) / self.games)
+
+    def elo(self) -> float:
+        p = min(max(self.win_rate(), 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / p - 1)
+
+
+def elo_ratings(policies: list[str], pairings: dict, iterations: int = 1000) -> dict:
+    """
+    The Elo ratings that best explain every game of all pairings, shifted to a mean of 0.
+    A Bradley-Terry maximum likelihood fit by gradient steps, so a pairing counts by its number of games.
+    """
+    ratings = dict.fromkeys(policies, 0.0)
+    games = dict.fromkeys(policies, 0)
+    for (first, second), pairing in pairings.items():
+        games[first] += pairing.games
+        games[second] += pairing.games
+    for _ in range(iterations):
+        gradient = dict.fromkeys(policies, 0.0)
+        for (first, second), pairing in pairings.items():
+            if pairing.games == 0:
+                continue
+            expected = 1 / (1 + 10 ** ((ratings[second] - ratings[first]) / 400))
+            difference = pairing.games * (pairing.win_rate() - expected)
+            gradient[first] += difference
+            gradient[second] -= difference
+        for policy in policies:
+            # Scaled by the games of the policy, so a step is at most about half a Newton step.
+            if games[policy]:
+                ratings[policy] += 400 * gradient[policy] / games[policy]
+    mean = sum(ratings.values()) / len(ratings)
+    return {policy: rating - mean for policy, rating in ratings.items()}
+
+
+def tournament(
+    policies: list[str],
+    agents: dict,
+    workers: int,
+    chunk: int,
+    max_games: int,
+    delta: float,
+    alpha: float,
+    beta: float,
+    seed: int,
+) -> dict:
+    pairings = {
+        pair: Pairing(delta, alpha, beta) for pair in itertools.combinations(policies, 2)
+    }
+    next_seed = seed
+
+    def next_task(pair: tuple) -> tuple:
+        nonlocal next_seed
+        pairing = pairings[pair]
+        task = (pair, pairing.chunks % 2 == 1, next_seed, chunk)
+        pairing.chunks += 1
+        next_seed += chunk
+        return task
+
+    def open_pairs() -> list:
+        return [
+            pair
+            for pair, pairing in pairings.items()
+            if pairing.verdict is None and pairing.chunks * chunk < max_games
+        ]
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(agents,)) as pool:
+        running = set()
+        turn = 0
+        while True:
+            # Keep every worker busy, taking the open pairs in turn.
+            candidates = open_pairs()
+            while candidates and len(running) < workers * 2:
+                pair = candidates[turn % len(candidates)]
+                turn += 1
+                running.add(pool.submit(play_chunk, next_task(pair)))
+                candidates = open_pairs()
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                pair, wins, losses = future.result()
+                pairings[pair].add(chunk, wins, losses)
+                print(
+                    f"{pair[0]:>20} vs {pair[1]:<20} {pairings[pair].games:8} games "
+                    f"{pairings[pair].win_rate() * 100:6.2f}%",
+                    flush=True,
+                )
+    return pairings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policies", nargs="+", choices=BUILT_IN, default=BUILT_IN)
+    parser.add_argument("--agent", action="append", default=[], help="A DoubleQTableAgent table")
+    parser.add_argument("--single-agent", action="append", default=[], help="An Agent table in q_tables/")
+    parser.add_argument("--mapped", action="store_true", help="Map the .qt files of the --agent tables")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk", type=int, default=200)
+    parser.add_argument("--max-games", type=int, default=100000)
+    parser.add_argument("--delta", type=float, default=0.02)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Loaded once here, the workers get a copy of them.
+    agents = {}
+    for file_name in args.agent:
+        agents[file_name] = DoubleQTableAgent(epsilon=0, file_name=file_name, mapped=args.mapped)
+    for file_name in args.single_agent:
+        agents[file_name] = Agent(epsilon=0, file_name=file_name)
+    policies = args.policies + list(agents)
+    if len(policies) < 2:
+        parser.error("A tournament needs at least two policies")
+
+    pairings = tournament(
+        policies,
+        agents,
+        args.workers,
+        args.chunk,
+        args.max_games,
+        args.delta,
+        args.alpha,
+        args.beta,
+        args.seed,
+    )
+
+    print()
+    games = sum(pairing.games for pairing in pairings.values())
+    print(f"{games} games")
+    for (first, second), pairing in pairings.items():
+        print(
+            f"{first:>20} vs {second:<20} {pairing.games:8} games "
+            f"{pairing.win_rate() * 100:6.2f}% ± {pairing.win_rate_error() * 100:.2f}  "
+            f"Elo {pairing.elo():+7.1f}  {pairing.verdict or 'undecided'}"
+        )
+    print()
+    for policy, rating in sorted(
+        elo_ratings(policies, pairings).items(), key=lambda item: item[1], reverse=True
+    ):
+        print(f"{policy:>20} {rating:+7.1f}")
@@ -0,0 +1,268 @@
+"""
+The training script for DoubleQTableAgent against SimpleStrategyPlayer.
+Trains every (epsilon, gamma, alpha) configuration below for `outer` iterations of `inner` games
+and writes its tables, its metrics (see metrics.py) and optionally instrumentation and a profile.
+
+It is kept out of blazing8s.py so the engine, the players and the agents import with the standard
+library (and NumPy when it is installed) only. Run with:
+    python train.py
+"""
+
+import json
+import os
+
+# timing
+from time import perf_counter
+
+from blazing8s import (
+    BetterAgentPlayer,
+    DoubleQTableAgent,
+    Game,
+    Player,
+    SimpleStrategyPlayer,
+)
+from instrumentation import Instrumentation
+from metrics import MetricsWriter
+
+
+def main() -> None:
+    # epsilons = [0.025, 0.01]
+    # gammas = [0.95, 0.975, 0.99]
+    # alphas = [0.4, 0.5, 0.6]
+    # epsilons = [0.02, 0.015, 0.01]
+    # epsilons = [0.02, 0.01]
+    # gammas = [0.97, 0.98, 0.99]
+    file_prefix = "double_q_table_"
+    training = True
+    # epsilon_multiplier = 0.995
+    epsilon_multiplier = 0.999
+    gammas = [1]
+    epsilons = [0.04]
+    alphas = [0.35]
+    # Play the games of each outer iteration in several processes.
+    parallel = False
+    workers = os.cpu_count()
+    sync_interval = 50
+    merge = "average"
+    # Games between incremental checkpoints of the q tables, see checkpoint.py. None turns them off.
+    # Checkpoints are taken between outer iterations and store the outer iteration, epsilon and the wins,
+    # so a run that crashed continues from its last checkpoint. It is removed once the tables are written.
+    checkpoint_interval = 3000
+
+    best_win_percent = 0
+    best_epsilon = None
+    best_gamma = None
+    best_alpha = None
+
+    # profiling:
+    import cProfile
+    import pstats
+
+    profiling = False
+    # Write timers and counters for every outer iteration to instrumentation.jsonl.
+    instrumenting = False
+
+    if profiling:
+        pr = cProfile.Profile()
+        pr.enable()
+    t1 = perf_counter()
+
+    for original_epsilon in epsilons:
+        for gamma in gammas:
+            for alpha in alphas:
+                print(f"epsilon: {original_epsilon}, gamma: {gamma}, alpha: {alpha}")
+                try:
+                    if training:
+                        agent = DoubleQTableAgent(
+                            epsilon=original_epsilon,
+                            alpha=alpha,
+                            gamma=gamma,
+                            file_name=f"{file_prefix}_simple_strategy_{original_epsilon}e{gamma}g{alpha}a.bin",
+                        )
+                    else:
+                        agent = DoubleQTableAgent(
+                            epsilon=original_epsilon,
+                            alpha=alpha,
+                            gamma=gamma,
+                            file_name=f"{file_prefix}_simple_strategy_{original_epsilon}e{gamma}g{alpha}a.bin",
+                        )
+                except FileNotFoundError as e:
+                    print("Failed to load q table")
+                    agent = DoubleQTableAgent(
+                        epsilon=original_epsilon, alpha=alpha, gamma=gamma
+                    )
+                checkpointer = None
+                if training and checkpoint_interval is not None:
+                    import checkpoint
+
+                    checkpointer = checkpoint.Checkpointer(
+                        agent,
+                        f"{file_prefix}_simple_strategy_{original_epsilon}e{gamma}g{alpha}a.bin",
+                        interval=checkpoint_interval,
+                    )
+                player1 = BetterAgentPlayer("Player 1", agent=agent)
+                instrumentation = None
+                # player1 = Player("Player 1")
+                # player1.agent = Agent()
+                # table_len = len(player1.agent.q_table)
+                if training:
+                    # player2 = RandomPlayer("Player 2", GOOD_RANDOM=False)
+                    # player2 = RandomPlayer("Player 2", GOOD_RANDOM=True)
+                    player2 = SimpleStrategyPlayer("Player 2")
+                else:
+                    player2 = Player("Player 2")
+                if instrumenting:
+                    instrumentation = Instrumentation()
+                    instrumentation.attach_player(player1)
+                    instrumentation.attach_player(player2)
+                    instrumentation.attach_agent(agent)
+                total_p1_wins = 0
+                total_p2_wins = 0
+                outer = 100
+                inner = 300
+                if parallel and training:
+                    from parallel_training import ParallelTrainer
+
+                    trainer = ParallelTrainer(
+                        agent, workers=workers, sync_interval=sync_interval, merge=merge
+                    )
+                epsilon = original_epsilon if training else 0
+                first_outer = 0
+                if checkpointer is not None and checkpointer.progress:
+                    # Continue a run that crashed from its last checkpoint.
+                    first_outer = checkpointer.progress["outer"]
+                    epsilon = checkpointer.progress["epsilon"]
+                    total_p1_wins = checkpointer.progress["p1_wins"]
+                    total_p2_wins = checkpointer.progress["p2_wins"]
+                # One row per outer iteration in a file per configuration, see metrics.py. Plot it with:
+                #     python metrics.py plot <metrics file> <png file>
+                # A resumed run keeps the rows up to its checkpoint, a new one starts the file over.
+                metrics_file = f"training_metrics_{original_epsilon}e{gamma}g{alpha}a.csv"
+                metrics = MetricsWriter(
+                    metrics_file, resume_at=first_outer * inner if first_outer else None
+                )
+                for j in range(first_outer, outer):
+                    outer_start = perf_counter()
+                    epsilon = epsilon * epsilon_multiplier
+                    player1.agent.epsilon = epsilon
+                    if isinstance(agent, DoubleQTableAgent):
+                        table_len = len(player1.agent.q_table1) + len(
+                            player1.agent.q_table2
+                        )
+                    else:
+                        table_len = len(agent.q_table)
+                    p1_wins = 0
+                    p2_wins = 0
+                    if parallel and training:
+                        p1_wins, p2_wins = trainer.play(inner)
+                    else:
+                        for i in range(inner):
+                            game = Game(
+                                player1,
+                                player2,
+                                verbose=False if training else True,
+                                instrumentation=instrumentation,
+                            )
+                            winner = game.start()
+                            if winner == 1:
+                                p1_wins += 1
+                            elif winner == 2:
+                                p2_wins += 1
+                    win_percent = p1_wins / (p1_wins + p2_wins)
+                    if isinstance(agent, DoubleQTableAgent):
+                        extra_in_table = (
+                            len(player1.agent.q_table1)
+                            + len(player1.agent.q_table2)
+                            - table_len
+                        )
+                    else:
+                        extra_in_table = len(agent.q_table) - table_len
+                    total_p1_wins += p1_wins
+                    total_p2_wins += p2_wins
+                    win_percent = total_p1_wins / (total_p1_wins + total_p2_wins)
+                    curr_win_percent = p1_wins / (p1_wins + p2_wins)
+                    if checkpointer is not None:
+                        checkpointer.played(
+                            inner,
+                            {
+                                "outer": j + 1,
+                                "epsilon": epsilon,
+                                "p1_wins": total_p1_wins,
+                                "p2_wins": total_p2_wins,
+                            },
+                        )
+                    metrics.write(
+                        {
+                            "games": (j + 1) * inner,
+                            "win_percent": win_percent,
+                            "epsilon": original_epsilon,
+                            "gamma": gamma,
+                            "alpha": alpha,
+                            "q_table_len": table_len + extra_in_table,
+                            "seconds": perf_counter() - outer_start,
+                            "total_seconds": perf_counter() - t1,
+                        }
+                    )
+                    if instrumentation is not None:
+                        record = instrumentation.flush(
+                            outer=j,
+                            games=(j + 1) * inner,
+                            epsilon=original_epsilon,
+                            gamma=gamma,
+                            alpha=alpha,
+                        )
+                        with open("instrumentation.jsonl", "a") as f:
+                            f.write(json.dumps(record) + "\n")
+                if parallel and training:
+                    trainer.close()
+                metrics.close()
+                print(
+                    f"Metrics written to {metrics_file}, plot them with: python metrics.py plot {metrics_file} <png file>"
+                )
+                win_percent = total_p1_wins / (total_p1_wins + total_p2_wins)
+                if win_percent > best_win_percent:
+                    best_win_percent = win_percent
+                    best_epsilon = original_epsilon
+                    best_gamma = gamma
+                    best_alpha = alpha
+                print(
+                    f"Player 1 total win %: {total_p1_wins/(total_p1_wins + total_p2_wins)}"
+                )
+                print(f"epsilon: {original_epsilon}, gamma: {gamma}, alpha: {alpha}")
+                if training:
+                    print("Writing into file")
+                    print(f"{file_prefix}{original_epsilon}e{gamma}g{alpha}a.bin")
+                    agent.write_q_table(
+                        f"{file_prefix}_simple_strategy_{original_epsilon}e{gamma}g{alpha}a.bin"
+                    )
+                    print("Q table written into file")
+                    if checkpointer is not None:
+                        checkpointer.close()
+                        checkpoint.remove(checkpointer.name)
+                    # print("Q table hits: ", player1.agent.q_table_hits)
+                    # print("Q table attempts: ", player1.agent.q_table_attempts)
+                    # print(
+                    #     "Q table hit %: ",
+                    #     player1.agent.q_table_hits / player1.agent.q_table_attempts,
+                    # )
+    print(
+        f"Best epsilon: {best_epsilon}, best gamma: {best_gamma}, best alpha: {best_alpha}"
+    )
+    print("Winning %: ", best_win_percent)
+
+    t2 = perf_counter()
+    print(f"Time taken: {t2 - t1}")
+
+    if profiling:
+        pr.disable()
+        ps = pstats.Stats(pr).sort_stats("cumulative")
+        # print into file
+        ps.print_stats()
+
+
+    # player1.write_q_table("q_table_mini_01e095g.bin")
+    # player1.write_q_table("q_table_2_1e975g4a_1.bin")
+
+
+if __name__ == "__main__":
+    main()